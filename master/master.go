@@ -121,18 +121,22 @@ func main() {
 	}
 
 	go tombstoneCleaner()
+	go partialUploadCleaner()
 
 	http.HandleFunc("/register", handleRegister)
 	http.HandleFunc("/checksum", handleChecksum)
 	http.HandleFunc("/get-checksum", handleGetChecksum)
 	http.HandleFunc("/verify", handleVerify)
 	http.HandleFunc("/delete", handleDelete)
+	http.HandleFunc("/delete_batch", handleDeleteBatch)
 	http.HandleFunc("/health", handleHealth)
 	http.HandleFunc("/stats", handleStats)
+	http.HandleFunc("/nodes", handleNodes)
 	http.HandleFunc("/metrics", handleMetrics)
 	http.HandleFunc("/search", handleSearch)
 	http.HandleFunc("/", handleIndex)
 	http.HandleFunc("/upload", handleUpload)
+	http.HandleFunc("/upload_part", handleUploadPart)
 	http.HandleFunc("/download", handleDownload)
 	http.HandleFunc("/play", handlePlay)
 
@@ -281,13 +285,63 @@ func handleDelete(w http.ResponseWriter, r *http.Request) {
 	}
 
 	name := r.URL.Query().Get("name")
-	state.mu.Lock()
-	nodes, exists := state.fileIndex[name]
+	deleted, exists := deleteFile(name)
 	if !exists {
-		state.mu.Unlock()
 		http.Error(w, "文件不存在", 404)
 		return
 	}
+	w.Write([]byte(fmt.Sprintf("OK:%d", deleted)))
+}
+
+// handleDeleteBatch 一次请求删除多个文件，请求体为 {"names": [...], "secret": "..."}，
+// 返回每个文件的状态码与响应，格式与 /delete 的单文件结果一致
+func handleDeleteBatch(w http.ResponseWriter, r *http.Request) {
+	if r.Method != http.MethodPost {
+		http.Error(w, "Method Not Allowed", 405)
+		return
+	}
+
+	var req struct {
+		Names  []string `json:"names"`
+		Secret string   `json:"secret"`
+	}
+	if err := json.NewDecoder(r.Body).Decode(&req); err != nil {
+		http.Error(w, "请求格式错误", 400)
+		return
+	}
+	if req.Secret != AdminSecret {
+		http.Error(w, "Unauthorized", 401)
+		return
+	}
+
+	type deleteResult struct {
+		Status   int    `json:"status"`
+		Response string `json:"response"`
+	}
+	results := make(map[string]deleteResult, len(req.Names))
+	for _, name := range req.Names {
+		deleted, exists := deleteFile(name)
+		if exists {
+			results[name] = deleteResult{200, fmt.Sprintf("OK:%d", deleted)}
+		} else {
+			results[name] = deleteResult{404, "文件不存在"}
+		}
+	}
+
+	jsonData, _ := json.Marshal(results)
+	w.Header().Set("Content-Type", "application/json")
+	w.Write(jsonData)
+}
+
+// deleteFile 从所有持有副本的节点删除文件并记录墓碑，返回删除成功的节点数和文件是否存在
+func deleteFile(name string) (int, bool) {
+	state.mu.Lock()
+	defer state.mu.Unlock()
+
+	nodes, exists := state.fileIndex[name]
+	if !exists {
+		return 0, false
+	}
 
 	var wg sync.WaitGroup
 	var mu sync.Mutex
@@ -329,8 +383,7 @@ func handleDelete(w http.ResponseWriter, r *http.Request) {
 		fmt.Printf("文件 %s 部分删除失败（剩余 %d 个节点），创建墓碑并保留元数据\n", name, len(nodes))
 	}
 
-	state.mu.Unlock()
-	w.Write([]byte(fmt.Sprintf("OK:%d", len(successNodes))))
+	return len(successNodes), true
 }
 
 func handleHealth(w http.ResponseWriter, r *http.Request) {
@@ -352,6 +405,26 @@ func handleStats(w http.ResponseWriter, r *http.Request) {
 	w.Write(jsonData)
 }
 
+// handleNodes 返回当前活跃节点及其最近一次心跳时间（Unix 毫秒），供测试脚本等待节点就绪
+func handleNodes(w http.ResponseWriter, r *http.Request) {
+	type nodeInfo struct {
+		Addr     string `json:"addr"`
+		LastSeen int64  `json:"last_seen"`
+	}
+
+	state.mu.RLock()
+	active := make([]nodeInfo, 0, len(state.activeNodes))
+	for addr, last := range state.activeNodes {
+		active = append(active, nodeInfo{addr, last.UnixMilli()})
+	}
+	state.mu.RUnlock()
+	sort.Slice(active, func(i, j int) bool { return active[i].Addr < active[j].Addr })
+
+	jsonData, _ := json.Marshal(map[string]interface{}{"active": active})
+	w.Header().Set("Content-Type", "application/json")
+	w.Write(jsonData)
+}
+
 func handleMetrics(w http.ResponseWriter, r *http.Request) {
 	state.mu.RLock()
 	nodeCount := len(state.activeNodes)
@@ -484,10 +557,19 @@ func handleUpload(w http.ResponseWriter, r *http.Request) {
 		http.Error(w, "文件读取失败", 400)
 		return
 	}
+
+	if err := distributeFile(name, fileData); err != nil {
+		http.Error(w, err.Error(), 500)
+		return
+	}
+	w.WriteHeader(200)
+}
+
+// distributeFile 将文件并行写入一致性哈希选出的副本节点，并更新文件索引
+func distributeFile(name string, fileData []byte) error {
 	targets := state.ring.GetNodes(name, 2)
 	if len(targets) == 0 {
-		http.Error(w, "无可用存储节点", 500)
-		return
+		return fmt.Errorf("无可用存储节点")
 	}
 
 	var wg sync.WaitGroup
@@ -548,19 +630,132 @@ func handleUpload(w http.ResponseWriter, r *http.Request) {
 
 	wg.Wait()
 
-	if len(successNodes) > 0 {
-		state.mu.Lock()
-		if state.fileIndex[name] == nil {
-			state.fileIndex[name] = make(map[string]bool)
+	if len(successNodes) == 0 {
+		return fmt.Errorf("所有存储节点写入失败")
+	}
+
+	state.mu.Lock()
+	if state.fileIndex[name] == nil {
+		state.fileIndex[name] = make(map[string]bool)
+	}
+	for _, n := range successNodes {
+		state.fileIndex[name][n] = true
+	}
+	state.mu.Unlock()
+	fmt.Printf("文件 %s 分发完成，成功副本数: %d\n", name, len(successNodes))
+	return nil
+}
+
+// partialUpload 记录分片上传中已收到的分片，全部到齐后拼装分发
+type partialUpload struct {
+	name     string
+	parts    [][]byte
+	received int
+	created  time.Time
+}
+
+var (
+	uploadsMu      sync.Mutex
+	partialUploads = make(map[string]*partialUpload)
+)
+
+const (
+	partialUploadTTL = 30 * time.Minute
+	// 单个分片的最大字节数，与客户端的分片大小一致
+	maxPartSize = 32 << 20
+	// 分片上传的单文件上限，由此限定分片总数
+	maxUploadSize = 16 << 30
+	maxPartTotal  = (maxUploadSize + maxPartSize - 1) / maxPartSize
+)
+
+// handleUploadPart 接收大文件的单个分片：
+// 请求体为分片原始数据，X-Upload-Id / X-Part-Index / X-Part-Total 标识分片位置；
+// DELETE 请求放弃该 X-Upload-Id 下已收到的分片
+func handleUploadPart(w http.ResponseWriter, r *http.Request) {
+	if r.FormValue("secret") != AdminSecret {
+		http.Error(w, "Unauthorized", 401)
+		return
+	}
+
+	if r.Method == http.MethodDelete {
+		uploadID := r.Header.Get("X-Upload-Id")
+		uploadsMu.Lock()
+		if u, ok := partialUploads[uploadID]; ok {
+			delete(partialUploads, uploadID)
+			fmt.Printf("放弃分片上传: %s (%s)\n", u.name, uploadID)
 		}
-		for _, n := range successNodes {
-			state.fileIndex[name][n] = true
+		uploadsMu.Unlock()
+		w.Write([]byte("OK"))
+		return
+	}
+
+	name := r.URL.Query().Get("name")
+	if !isAllowedExtension(name) {
+		http.Error(w, "仅支持上传视频文件 (mp4, mkv, avi, mov, wmv, flv, webm, m4v)", 400)
+		return
+	}
+
+	uploadID := r.Header.Get("X-Upload-Id")
+	index, errIdx := strconv.Atoi(r.Header.Get("X-Part-Index"))
+	total, errTotal := strconv.Atoi(r.Header.Get("X-Part-Total"))
+	if uploadID == "" || errIdx != nil || errTotal != nil || total <= 0 || total > maxPartTotal || index < 0 || index >= total {
+		http.Error(w, "分片参数错误", 400)
+		return
+	}
+
+	data, err := io.ReadAll(http.MaxBytesReader(w, r.Body, maxPartSize))
+	if err != nil {
+		http.Error(w, "分片读取失败", 400)
+		return
+	}
+
+	uploadsMu.Lock()
+	u, ok := partialUploads[uploadID]
+	if !ok {
+		u = &partialUpload{name: name, parts: make([][]byte, total), created: time.Now()}
+		partialUploads[uploadID] = u
+	}
+	if u.name != name || len(u.parts) != total {
+		uploadsMu.Unlock()
+		http.Error(w, "分片参数与已有上传不一致", 400)
+		return
+	}
+	if u.parts[index] == nil {
+		u.received++
+	}
+	u.parts[index] = data
+	complete := u.received == total
+	if complete {
+		delete(partialUploads, uploadID)
+	}
+	uploadsMu.Unlock()
+
+	if !complete {
+		w.Write([]byte("OK:PART"))
+		return
+	}
+
+	fileData := bytes.Join(u.parts, nil)
+	if err := distributeFile(name, fileData); err != nil {
+		http.Error(w, err.Error(), 500)
+		return
+	}
+	w.Write([]byte("OK:COMPLETE"))
+}
+
+// partialUploadCleaner 定期释放超时未完成的分片上传，Master 空闲时也能回收内存
+func partialUploadCleaner() {
+	ticker := time.NewTicker(time.Minute)
+	defer ticker.Stop()
+	for range ticker.C {
+		uploadsMu.Lock()
+		for id, u := range partialUploads {
+			if time.Since(u.created) > partialUploadTTL {
+				delete(partialUploads, id)
+				fmt.Printf("清理超时的分片上传: %s (%s)\n", u.name, id)
+			}
 		}
-		state.mu.Unlock()
-		w.WriteHeader(200)
-		fmt.Printf("文件 %s 分发完成，成功副本数: %d\n", name, len(successNodes))
-	} else {
-		http.Error(w, "所有存储节点写入失败", 500)
+		uploadsMu.Unlock()
 	}
 }
 
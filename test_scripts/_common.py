@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+"""
+测试脚本公共工具 - 墓碑测试与验证脚本共用的测试数据与日志时间戳
+"""
+
+import time
+from functools import lru_cache
+
+# 最近一次格式化的时间戳：[整数秒, 格式化字符串]
+_LAST_SEC = [0, '']
+
+
+@lru_cache(maxsize=None)
+def default_test_files(n=20, start=0):
+    """默认测试文件名（test_movie_0000.mp4 起），同一进程内相同参数只生成一次"""
+    return tuple(f"test_movie_{i:04d}.mp4" for i in range(start, start + n))
+
+
+def log_timestamp():
+    """当前时间（精确到秒），同一秒内复用上次的格式化结果"""
+    now = int(time.time())
+    if now != _LAST_SEC[0]:
+        _LAST_SEC[0] = now
+        _LAST_SEC[1] = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(now))
+    return _LAST_SEC[1]
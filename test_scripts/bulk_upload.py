@@ -8,8 +8,18 @@ import os
 import sys
 import time
 import json
+import random
+import functools
+import threading
+import uuid
+import http.client
+from urllib.parse import urlsplit, quote
 import requests
+from requests.adapters import HTTPAdapter
+from requests_toolbelt import MultipartEncoder
 import argparse
+from array import array
+import numpy as np
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from pathlib import Path
@@ -18,11 +28,38 @@ from tqdm import tqdm
 # 默认配置
 DEFAULT_MASTER_URL = "http://localhost:8080"
 DEFAULT_UPLOAD_ENDPOINT = "/upload"
+DEFAULT_PART_UPLOAD_ENDPOINT = "/upload_part"
 DEFAULT_ADMIN_SECRET = "admin888"
-DEFAULT_CONCURRENT_UPLOADS = 8
+DEFAULT_CONCURRENT_UPLOADS = 32
 DEFAULT_RETRY_COUNT = 3
 DEFAULT_TIMEOUT = 300
-DEFAULT_CHUNK_SIZE = 8192
+DEFAULT_CHUNK_SIZE = 65536
+
+# 自动并发调优：初始并发、并发上下限、每个观测窗口的完成数、吞吐 EMA 系数、调整阈值
+AUTO_TUNE_INITIAL = 4
+AUTO_TUNE_MIN = 2
+AUTO_TUNE_MAX = 256
+AUTO_TUNE_WINDOW = 32
+AUTO_TUNE_ALPHA = 0.2
+AUTO_TUNE_MIN_GAIN = 0.10
+
+# 分片上传：超过阈值的大文件拆分为多个分片，每个文件内并行上传
+MULTIPART_THRESHOLD = 128 * 1024 * 1024
+PART_SIZE = 32 * 1024 * 1024
+PART_CONCURRENCY = 4
+
+# 重试退避：基础延迟与上限（秒）
+BACKOFF_BASE = 1.0
+MAX_BACKOFF = 30.0
+
+VIDEO_EXTENSIONS = frozenset(['.mp4', '.mkv', '.avi', '.mov', '.wmv', '.flv', '.webm', '.m4v'])
+
+SIZE_UNITS = ('B', 'KB', 'MB', 'GB', 'TB', 'PB')
+# 上传结果状态编码：0=失败，1=成功
+STATUS_FAILED = 0
+STATUS_SUCCESS = 1
+STATUS_NAMES = ('failed', 'success')
+STATUS_ICONS = ('✗', '✓')
 
 # 全局变量
 upload_stats = {
@@ -34,26 +71,256 @@ upload_stats = {
     'uploaded_size': 0,
     'start_time': None,
     'end_time': None,
-    'file_results': [],
-    'errors': []
+    # 按列存储每个文件的上传结果（结构数组），数值列使用连续内存的 array
+    'file_results': {
+        'name': [],
+        'size': array('q'),
+        'size_fmt': [],
+        'status': array('B'),
+        'upload_time': array('d'),
+        'attempts': array('I'),
+        'error': []
+    },
+    'errors': [],
+    'auto_concurrency': None
 }
 
-def get_file_size(file_path):
-    """获取文件大小（字节）"""
-    return os.path.getsize(file_path)
+# 每个上传线程持有独立的 Session，复用 HTTP keep-alive 连接
+_tls = threading.local()
+
+class _BlockSizeAdapter(HTTPAdapter):
+    """发送文件类请求体时按 blocksize 读取与发送的 HTTPAdapter"""
+
+    def __init__(self, blocksize, **kwargs):
+        self._blocksize = blocksize
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs['blocksize'] = self._blocksize
+        super().init_poolmanager(*args, **kwargs)
+
+def _session(chunk_size=DEFAULT_CHUNK_SIZE):
+    """获取当前线程的 HTTP Session（惰性创建）"""
+    s = getattr(_tls, 's', None)
+    if s is None:
+        s = requests.Session()
+        adapter = _BlockSizeAdapter(chunk_size, pool_connections=64, pool_maxsize=64)
+        s.mount('http://', adapter)
+        s.mount('https://', adapter)
+        _tls.s = s
+    return s
+
+class _FileSlice:
+    """文件中 [offset, offset+count) 区间的只读视图，按 blocksize 以 pread 读取，用于流式发送分片
+
+    多个分片共享同一文件描述符，各自维护读取位置；提供 __len__ 供 requests 设置 Content-Length。
+    """
+
+    def __init__(self, f, offset, count):
+        self._fd = f.fileno()
+        self._pos = offset
+        self._end = offset + count
+
+    def __len__(self):
+        return self._end - self._pos
+
+    def read(self, size=-1):
+        remaining = self._end - self._pos
+        if size is None or size < 0 or size > remaining:
+            size = remaining
+        data = os.pread(self._fd, size, self._pos)
+        self._pos += len(data)
+        return data
+
+class AdaptiveLimiter:
+    """根据实测吞吐量动态调整的并发上限
+
+    每完成 AUTO_TUNE_WINDOW 个上传计算一次窗口吞吐量，与 EMA 平滑后的历史吞吐比较：
+    提升超过阈值则并发翻倍，下降超过阈值则并发减半。
+    """
+
+    def __init__(self, initial=AUTO_TUNE_INITIAL, lower=AUTO_TUNE_MIN, upper=AUTO_TUNE_MAX):
+        self.limit = initial
+        self.lower = lower
+        self.upper = upper
+        self.trajectory = [{'completed': 0, 'concurrency': initial, 'speed': None}]
+        self._sem = threading.Semaphore(initial)
+        self._lock = threading.Lock()
+        self._debt = 0  # 缩容时待回收的许可数
+        self._ema = None
+        self._completed = 0
+        self._window_bytes = 0
+        self._window_start = time.time()
+
+    def acquire(self):
+        self._sem.acquire()
+
+    def release(self):
+        with self._lock:
+            if self._debt:
+                self._debt -= 1
+                return
+        self._sem.release()
+
+    def record(self, nbytes):
+        """记录一次上传完成（失败记 0 字节），窗口结束时调整并发上限"""
+        self._completed += 1
+        self._window_bytes += nbytes
+        if self._completed % AUTO_TUNE_WINDOW:
+            return
+
+        now = time.time()
+        elapsed = now - self._window_start
+        speed = self._window_bytes / elapsed if elapsed > 0 else 0
+        self._window_start = now
+        self._window_bytes = 0
+
+        # 以平滑后的历史吞吐为基线，比较本窗口的实测吞吐
+        prev = self._ema
+        self._ema = speed if prev is None else AUTO_TUNE_ALPHA * speed + (1 - AUTO_TUNE_ALPHA) * prev
+        if prev:
+            if speed >= prev * (1 + AUTO_TUNE_MIN_GAIN):
+                self._resize(min(self.upper, self.limit * 2))
+            elif speed <= prev * (1 - AUTO_TUNE_MIN_GAIN):
+                self._resize(max(self.lower, self.limit // 2))
+        elif prev is None:
+            # 首个窗口只建立基线，直接扩容以探测更高并发的收益
+            self._resize(min(self.upper, self.limit * 2))
+
+        self.trajectory.append({'completed': self._completed, 'concurrency': self.limit, 'speed': self._ema})
+
+    def _resize(self, new_limit):
+        delta = new_limit - self.limit
+        self.limit = new_limit
+        if delta > 0:
+            with self._lock:
+                # 优先抵消尚未回收的缩容许可
+                offset = min(delta, self._debt)
+                self._debt -= offset
+                delta -= offset
+            if delta:
+                self._sem.release(delta)
+        elif delta < 0:
+            with self._lock:
+                self._debt -= delta
+
+def _connection(host, port, timeout):
+    """获取当前线程到指定主机的 keep-alive 连接（惰性创建）"""
+    conns = getattr(_tls, 'conns', None)
+    if conns is None:
+        conns = _tls.conns = {}
+    conn = conns.get((host, port))
+    if conn is None:
+        conn = conns[(host, port)] = http.client.HTTPConnection(host, port, timeout=timeout)
+    return conn
+
+def _sendfile_request(url, headers, preamble, f, offset, count, trailer, timeout):
+    """发送 POST 请求，文件区间通过 sendfile 由内核直接发送，返回 (状态码, 响应内容)"""
+    parts = urlsplit(url)
+    conn = _connection(parts.hostname, parts.port or 80, timeout)
+    path = parts.path or '/'
+    if parts.query:
+        path += '?' + parts.query
 
+    try:
+        conn.putrequest('POST', path)
+        for name, value in headers.items():
+            conn.putheader(name, value)
+        conn.putheader('Content-Length', str(len(preamble) + count + len(trailer)))
+        conn.endheaders(preamble or None)
+        conn.sock.sendfile(f, offset, count)
+        if trailer:
+            conn.send(trailer)
+        response = conn.getresponse()
+        return response.status, response.read().decode('utf-8', 'replace')
+    except Exception:
+        # 连接状态未知，关闭后由下次重试重新建立
+        conn.close()
+        raise
+
+def _sendfile_post(url, admin_secret, file_name, f, size, timeout):
+    """手工拼装 multipart 请求，文件部分通过 sendfile 由内核直接发送，返回 (状态码, 响应内容)"""
+    boundary = uuid.uuid4().hex
+    quoted_name = file_name.replace('"', '%22')
+    preamble = (
+        f'--{boundary}\r\n'
+        f'Content-Disposition: form-data; name="secret"\r\n\r\n'
+        f'{admin_secret}\r\n'
+        f'--{boundary}\r\n'
+        f'Content-Disposition: form-data; name="movie"; filename="{quoted_name}"\r\n'
+        f'Content-Type: video/mp4\r\n\r\n'
+    ).encode('utf-8')
+    trailer = f'\r\n--{boundary}--\r\n'.encode('ascii')
+    headers = {'Content-Type': f'multipart/form-data; boundary={boundary}'}
+    return _sendfile_request(url, headers, preamble, f, 0, size, trailer, timeout)
+
+def _part_url(master_url, admin_secret, file_name):
+    """分片上传接口地址"""
+    return (f"{master_url}{DEFAULT_PART_UPLOAD_ENDPOINT}"
+            f"?name={quote(file_name)}&secret={quote(admin_secret)}")
+
+def _upload_parts(master_url, admin_secret, file_info, f, timeout, chunk_size, upload_id):
+    """将大文件拆分为分片并行上传，所有分片成功返回 (200, 响应内容)，否则返回首个失败分片的结果
+
+    各分片均按显式偏移读取（sendfile / pread），可共享同一个文件对象。
+    同一文件的各次重试复用 upload_id，Master 端覆盖已收到的分片而不是另起一份。
+    """
+    url = _part_url(master_url, admin_secret, file_info['name'])
+    size = file_info['size']
+    total = -(-size // PART_SIZE)
+    use_sendfile = url.startswith('http://')
+
+    def post_part(index):
+        offset = index * PART_SIZE
+        count = min(PART_SIZE, size - offset)
+        headers = {
+            'Content-Type': 'application/octet-stream',
+            'X-Upload-Id': upload_id,
+            'X-Part-Index': str(index),
+            'X-Part-Total': str(total)
+        }
+        if use_sendfile:
+            return _sendfile_request(url, headers, b'', f, offset, count, b'', timeout)
+        # 分片按块从文件读取并发送，内存中不保留整个分片
+        response = _session(chunk_size).post(url, data=_FileSlice(f, offset, count), headers=headers, timeout=timeout)
+        return response.status_code, response.text
+
+    with ThreadPoolExecutor(max_workers=min(PART_CONCURRENCY, total), thread_name_prefix='part') as executor:
+        results = list(executor.map(post_part, range(total)))
+
+    for status, text in results:
+        if status != 200:
+            return status, text
+    return 200, results[-1][1]
+
+def _abort_parts(master_url, admin_secret, file_name, upload_id, timeout):
+    """放弃分片上传，让 Master 立即释放已收到的分片"""
+    try:
+        _session().delete(_part_url(master_url, admin_secret, file_name),
+                          headers={'X-Upload-Id': upload_id}, timeout=timeout)
+    except requests.exceptions.RequestException:
+        pass
+
+def _backoff(attempt):
+    """带随机抖动的指数退避，避免并发线程同时重试"""
+    delay = min(MAX_BACKOFF, BACKOFF_BASE * (2 ** attempt))
+    time.sleep(random.uniform(0.75 * delay, 1.25 * delay))
+
+@functools.lru_cache(maxsize=1024)
 def format_size(size_bytes):
     """格式化文件大小显示"""
-    for unit in ['B', 'KB', 'MB', 'GB']:
-        if size_bytes < 1024.0:
-            return f"{size_bytes:.2f} {unit}"
-        size_bytes /= 1024.0
-    return f"{size_bytes:.2f} TB"
+    if size_bytes <= 0:
+        return "0.00 B"
+    # 由位长度直接得出单位档位，无需逐级除以 1024
+    i = min(len(SIZE_UNITS) - 1, (int(size_bytes).bit_length() - 1) // 10) if size_bytes >= 1 else 0
+    return f"{size_bytes / (1 << (10 * i)):.2f} {SIZE_UNITS[i]}"
 
 def scan_video_files(directory, extensions=None):
     """扫描目录下的所有视频文件"""
     if extensions is None:
-        extensions = ['.mp4', '.mkv', '.avi', '.mov', '.wmv', '.flv', '.webm', '.m4v']
+        extensions = VIDEO_EXTENSIONS
+    else:
+        extensions = frozenset(ext.lower() for ext in extensions)
 
     files = []
     directory = Path(directory)
@@ -61,13 +328,17 @@ def scan_video_files(directory, extensions=None):
     if not directory.exists():
         raise FileNotFoundError(f"目录不存在: {directory}")
 
-    for ext in extensions:
-        for file_path in directory.glob(f"*{ext}"):
-            size = get_file_size(file_path)
+    # 单次遍历目录，复用 DirEntry 缓存的 stat 结果
+    with os.scandir(directory) as it:
+        for entry in it:
+            if not entry.is_file() or os.path.splitext(entry.name)[1].lower() not in extensions:
+                continue
+            size = entry.stat().st_size
             files.append({
-                'name': file_path.name,
-                'path': str(file_path),
+                'name': entry.name,
+                'path': entry.path,
                 'size': size,
+                'size_fmt': format_size(size),
                 'status': 'pending',
                 'attempts': 0,
                 'upload_time': 0,
@@ -76,99 +347,118 @@ def scan_video_files(directory, extensions=None):
 
     return sorted(files, key=lambda x: x['name'])
 
+def _fmt_err(e, attempt, retry_count):
+    """将上传异常格式化为错误信息"""
+    if isinstance(e, (requests.exceptions.Timeout, TimeoutError)):
+        return f"上传超时 (尝试 {attempt + 1}/{retry_count})"
+    if isinstance(e, (requests.exceptions.ConnectionError, ConnectionError, http.client.HTTPException)):
+        return f"连接错误: {str(e)}"
+    return f"上传失败: {str(e)}"
+
 def upload_file(file_info, master_url, endpoint, admin_secret, timeout, retry_count, chunk_size):
     """单文件上传逻辑"""
     url = f"{master_url}{endpoint}"
     file_path = file_info['path']
     file_name = file_info['name']
+    error_msg = '超过最大重试次数'
+    # 明文 HTTP 可走 sendfile 零拷贝路径；HTTPS 需在用户态加密，使用流式 multipart
+    use_sendfile = url.startswith('http://')
+    upload_id = uuid.uuid4().hex if file_info['size'] > MULTIPART_THRESHOLD else None
 
-    for attempt in range(retry_count):
-        try:
-            file_info['attempts'] = attempt + 1
-
-            with open(file_path, 'rb') as f:
-                files = {'movie': (file_name, f, 'video/mp4')}
-                data = {'secret': admin_secret}
+    # 文件只打开一次，各次重试复用同一文件描述符，并提示内核按顺序预读
+    with open(file_path, 'rb') as f:
+        if hasattr(os, 'posix_fadvise'):
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
 
+        for attempt in range(retry_count):
+            file_info['attempts'] = attempt + 1
+            try:
+                f.seek(0)
                 start_time = time.time()
 
-                response = requests.post(
-                    url,
-                    files=files,
-                    data=data,
-                    timeout=timeout
-                )
-
-                end_time = time.time()
-                upload_time = end_time - start_time
-
-                if response.status_code == 200:
-                    file_info['status'] = 'success'
-                    file_info['upload_time'] = upload_time
-                    return {
-                        'success': True,
-                        'upload_time': upload_time,
-                        'attempt': attempt + 1
-                    }
+                if upload_id is not None:
+                    status, text = _upload_parts(master_url, admin_secret, file_info, f, timeout, chunk_size, upload_id)
+                elif use_sendfile:
+                    status, text = _sendfile_post(url, admin_secret, file_name, f, file_info['size'], timeout)
                 else:
-                    raise Exception(f"HTTP {response.status_code}: {response.text}")
+                    # 流式生成 multipart 请求体，避免整个文件载入内存
+                    m = MultipartEncoder(fields={
+                        'secret': admin_secret,
+                        'movie': (file_name, f, 'video/mp4')
+                    })
+                    response = _session(chunk_size).post(
+                        url,
+                        data=m,
+                        headers={'Content-Type': m.content_type},
+                        timeout=timeout
+                    )
+                    status, text = response.status_code, response.text
 
-        except requests.exceptions.Timeout:
-            error_msg = f"上传超时 (尝试 {attempt + 1}/{retry_count})"
-            file_info['error'] = error_msg
-            if attempt < retry_count - 1:
-                time.sleep(2 ** attempt)  # 指数退避
-                continue
-            else:
-                return {
-                    'success': False,
-                    'error': error_msg,
-                    'attempts': attempt + 1
-                }
+                upload_time = time.time() - start_time
 
-        except requests.exceptions.ConnectionError as e:
-            error_msg = f"连接错误: {str(e)}"
-            file_info['error'] = error_msg
-            if attempt < retry_count - 1:
-                time.sleep(2 ** attempt)
-                continue
-            else:
-                return {
-                    'success': False,
-                    'error': error_msg,
-                    'attempts': attempt + 1
-                }
+                if status != 200:
+                    raise Exception(f"HTTP {status}: {text}")
 
-        except Exception as e:
-            error_msg = f"上传失败: {str(e)}"
-            file_info['error'] = error_msg
-            if attempt < retry_count - 1:
-                time.sleep(2 ** attempt)
-                continue
-            else:
+                file_info['status'] = 'success'
+                file_info['upload_time'] = upload_time
                 return {
-                    'success': False,
-                    'error': error_msg,
+                    'success': True,
+                    'upload_time': upload_time,
                     'attempts': attempt + 1
                 }
 
+            except Exception as e:
+                error_msg = _fmt_err(e, attempt, retry_count)
+                file_info['error'] = error_msg
+                if attempt < retry_count - 1:
+                    _backoff(attempt)
+
+    if upload_id is not None:
+        _abort_parts(master_url, admin_secret, file_name, upload_id, timeout)
     return {
         'success': False,
-        'error': '超过最大重试次数',
+        'error': error_msg,
         'attempts': retry_count
     }
 
-def concurrent_upload(files, master_url, endpoint, admin_secret, max_workers, timeout, retry_count, chunk_size):
-    """并发上传控制"""
-    results = []
-    total_size = sum(f['size'] for f in files)
-    uploaded_size = 0
+def _limited_upload(limiter, *args):
+    """在并发上限许可内执行上传"""
+    limiter.acquire()
+    try:
+        return upload_file(*args)
+    finally:
+        limiter.release()
+
+def concurrent_upload(files, master_url, endpoint, admin_secret, max_workers, timeout, retry_count, chunk_size,
+                      limiter=None):
+    """并发上传控制，返回本次成功上传的字节数
 
-    with tqdm(total=len(files), desc="上传进度", unit="文件") as pbar:
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+    指定 limiter 时，max_workers 只是线程数上限，实际并发由 limiter 动态控制。
+    """
+    uploaded_size = 0
+    task = upload_file if limiter is None else functools.partial(_limited_upload, limiter)
+
+    # 进度条限频渲染，统计信息由后台线程每秒刷新一次，避免完成回调争用 tqdm 的锁
+    with tqdm(total=len(files), desc="上传进度", unit="文件", mininterval=0.5,
+              miniters=max(1, len(files) // 200), smoothing=0.1, dynamic_ncols=True) as pbar:
+        stop = threading.Event()
+
+        def refresh_postfix():
+            while not stop.wait(1.0):
+                pbar.set_postfix({
+                    '成功': upload_stats['success_count'],
+                    '失败': upload_stats['failed_count'],
+                    '已上传': format_size(uploaded_size)
+                })
+
+        threading.Thread(target=refresh_postfix, name='upload-progress', daemon=True).start()
+
+        # 上传线程大部分时间阻塞在 socket I/O 上（释放 GIL），线程数不超过文件数
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(files))),
+                                thread_name_prefix='upload') as executor:
             future_to_file = {
                 executor.submit(
-                    upload_file,
+                    task,
                     file,
                     master_url,
                     endpoint,
@@ -181,56 +471,58 @@ def concurrent_upload(files, master_url, endpoint, admin_secret, max_workers, ti
 
             for future in as_completed(future_to_file):
                 file = future_to_file[future]
-                result = None
 
                 try:
                     result = future.result()
-                    file_info = {
-                        'name': file['name'],
-                        'size': file['size'],
-                        'status': 'success' if result['success'] else 'failed',
-                        'upload_time': result.get('upload_time', 0),
-                        'attempts': result.get('attempts', 0),
-                        'error': result.get('error', '')
-                    }
-
-                    if result['success']:
-                        upload_stats['success_count'] += 1
-                        uploaded_size += file['size']
-                        pbar.set_postfix({
-                            '成功': upload_stats['success_count'],
-                            '失败': upload_stats['failed_count'],
-                            '已上传': format_size(uploaded_size)
-                        })
-                    else:
-                        upload_stats['failed_count'] += 1
-                        upload_stats['errors'].append({
-                            'file': file['name'],
-                            'error': result.get('error', ''),
-                            'attempts': result.get('attempts', 0)
-                        })
-
-                    upload_stats['file_results'].append(file_info)
-                    pbar.update(1)
-
                 except Exception as e:
+                    result = {'success': False, 'error': str(e), 'attempts': 0}
+
+                if result['success']:
+                    upload_stats['success_count'] += 1
+                    uploaded_size += file['size']
+                else:
                     upload_stats['failed_count'] += 1
                     upload_stats['errors'].append({
                         'file': file['name'],
-                        'error': str(e),
-                        'attempts': 0
-                    })
-                    upload_stats['file_results'].append({
-                        'name': file['name'],
-                        'size': file['size'],
-                        'status': 'failed',
-                        'upload_time': 0,
-                        'attempts': 0,
-                        'error': str(e)
+                        'error': result.get('error', ''),
+                        'attempts': result.get('attempts', 0)
                     })
-                    pbar.update(1)
 
-    return results
+                if limiter is not None:
+                    limiter.record(file['size'] if result['success'] else 0)
+
+                attempts = result.get('attempts', 0)
+                upload_stats['retry_count'] += max(0, attempts - 1)
+                results = upload_stats['file_results']
+                results['name'].append(file['name'])
+                results['size'].append(file['size'])
+                results['size_fmt'].append(file['size_fmt'])
+                results['status'].append(STATUS_SUCCESS if result['success'] else STATUS_FAILED)
+                results['upload_time'].append(result.get('upload_time', 0))
+                results['attempts'].append(attempts)
+                results['error'].append(result.get('error', ''))
+
+                pbar.update(1)
+
+        stop.set()
+        pbar.set_postfix({
+            '成功': upload_stats['success_count'],
+            '失败': upload_stats['failed_count'],
+            '已上传': format_size(uploaded_size)
+        })
+
+    upload_stats['uploaded_size'] += uploaded_size
+    return uploaded_size
+
+def auto_concurrency_upload(files, master_url, endpoint, admin_secret, timeout, retry_count, chunk_size):
+    """由 AdaptiveLimiter 根据实测吞吐量动态调整并发数上传全部文件"""
+    limiter = AdaptiveLimiter()
+    concurrent_upload(files, master_url, endpoint, admin_secret,
+                      AUTO_TUNE_MAX, timeout, retry_count, chunk_size, limiter=limiter)
+
+    upload_stats['auto_concurrency'] = {'final': limiter.limit, 'trajectory': limiter.trajectory}
+    print(f"  最终并发数: {limiter.limit}")
+    print("  调整轨迹: " + " -> ".join(str(t['concurrency']) for t in limiter.trajectory))
 
 def calculate_performance_metrics():
     """计算性能指标"""
@@ -248,11 +540,13 @@ def calculate_performance_metrics():
     upload_speed = upload_stats['uploaded_size'] / total_time
 
     # 计算平均上传时间
-    success_files = [f for f in upload_stats['file_results'] if f['status'] == 'success']
-    if success_files:
-        avg_upload_time = sum(f['upload_time'] for f in success_files) / len(success_files)
-        max_upload_time = max(f['upload_time'] for f in success_files)
-        min_upload_time = min(f['upload_time'] for f in success_files)
+    results = upload_stats['file_results']
+    status = np.frombuffer(results['status'], dtype=np.uint8)
+    upload_times = np.frombuffer(results['upload_time'], dtype=np.float64)[status == STATUS_SUCCESS]
+    if upload_times.size:
+        avg_upload_time = float(upload_times.mean())
+        max_upload_time = float(upload_times.max())
+        min_upload_time = float(upload_times.min())
     else:
         avg_upload_time = 0
         max_upload_time = 0
@@ -284,7 +578,7 @@ def generate_report(output_dir, metrics):
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     report_file = os.path.join(output_dir, f"upload_report_{timestamp}.md")
 
-    with open(report_file, 'w', encoding='utf-8') as f:
+    with open(report_file, 'w', encoding='utf-8', buffering=1 << 20) as f:
         f.write("# 批量上传测试报告\n\n")
         f.write(f"生成时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
 
@@ -317,10 +611,10 @@ def generate_report(output_dir, metrics):
         if upload_stats['errors']:
             f.write("## 错误详情\n\n")
             f.write(f"共 {len(upload_stats['errors'])} 个上传失败:\n\n")
-            for error in upload_stats['errors'][:20]:  # 只显示前20个错误
-                f.write(f"### {error['file']}\n")
-                f.write(f"- 错误: {error['error']}\n")
-                f.write(f"- 重试次数: {error['attempts']}\n\n")
+            f.write(''.join(  # 只显示前20个错误
+                f"### {error['file']}\n- 错误: {error['error']}\n- 重试次数: {error['attempts']}\n\n"
+                for error in upload_stats['errors'][:20]
+            ))
 
             if len(upload_stats['errors']) > 20:
                 f.write(f"... 还有 {len(upload_stats['errors']) - 20} 个错误未显示\n\n")
@@ -329,10 +623,16 @@ def generate_report(output_dir, metrics):
         f.write("| 文件名 | 大小 | 状态 | 上传时间 | 重试次数 | 错误信息 |\n")
         f.write("|--------|------|------|----------|----------|----------|\n")
 
-        for result in upload_stats['file_results']:
-            status_icon = "✓" if result['status'] == 'success' else "✗"
-            f.write(f"| {result['name']} | {format_size(result['size'])} | {status_icon} {result['status']} | "
-                   f"{result['upload_time']:.2f}s | {result['attempts']} | {result.get('error', '')} |\n")
+        # 整张表一次性拼接后写入
+        results = upload_stats['file_results']
+        f.write(''.join(
+            f"| {name} | {size_fmt} | {STATUS_ICONS[status]} {STATUS_NAMES[status]} | "
+            f"{upload_time:.2f}s | {attempts} | {error} |\n"
+            for name, size_fmt, status, upload_time, attempts, error in zip(
+                results['name'], results['size_fmt'], results['status'],
+                results['upload_time'], results['attempts'], results['error']
+            )
+        ))
 
     return report_file
 
@@ -356,11 +656,12 @@ def save_metrics_json(output_dir, metrics):
             'total_size': upload_stats['total_size'],
             'uploaded_size': upload_stats['uploaded_size']
         },
-        'performance': metrics
+        'performance': metrics,
+        'auto_concurrency': upload_stats['auto_concurrency']
     }
 
     with open(metrics_file, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+        f.write(json.dumps(data, ensure_ascii=False, separators=(',', ':')))
 
     return metrics_file
 
@@ -374,6 +675,8 @@ def main():
                        help=f'Master 服务 URL (默认: {DEFAULT_MASTER_URL})')
     parser.add_argument('--concurrent', type=int, default=DEFAULT_CONCURRENT_UPLOADS,
                        help=f'并发上传数量 (默认: {DEFAULT_CONCURRENT_UPLOADS})')
+    parser.add_argument('--auto_concurrency', action='store_true',
+                       help='自动探测最佳并发数（忽略 --concurrent）')
     parser.add_argument('--retry', type=int, default=DEFAULT_RETRY_COUNT,
                        help=f'失败重试次数 (默认: {DEFAULT_RETRY_COUNT})')
     parser.add_argument('--timeout', type=int, default=DEFAULT_TIMEOUT,
@@ -392,7 +695,7 @@ def main():
     print("配置参数:")
     print(f"  输入目录: {args.input_dir}")
     print(f"  Master URL: {args.master_url}")
-    print(f"  并发上传数: {args.concurrent}")
+    print(f"  并发上传数: {'自动' if args.auto_concurrency else args.concurrent}")
     print(f"  失败重试次数: {args.retry}")
     print(f"  超时时间: {args.timeout}秒")
     if args.limit > 0:
@@ -424,7 +727,7 @@ def main():
             print("== 干运行模式 - 不实际上传 ==")
             print("文件列表:")
             for file in files[:10]:
-                print(f"  - {file['name']} ({format_size(file['size'])})")
+                print(f"  - {file['name']} ({file['size_fmt']})")
             if len(files) > 10:
                 print(f"  ... 还有 {len(files) - 10} 个文件")
             return 0
@@ -433,19 +736,29 @@ def main():
         print("开始上传...")
         upload_stats['start_time'] = time.time()
 
-        concurrent_upload(
-            files,
-            args.master_url,
-            DEFAULT_UPLOAD_ENDPOINT,
-            DEFAULT_ADMIN_SECRET,
-            args.concurrent,
-            args.timeout,
-            args.retry,
-            DEFAULT_CHUNK_SIZE
-        )
+        if args.auto_concurrency:
+            auto_concurrency_upload(
+                files,
+                args.master_url,
+                DEFAULT_UPLOAD_ENDPOINT,
+                DEFAULT_ADMIN_SECRET,
+                args.timeout,
+                args.retry,
+                DEFAULT_CHUNK_SIZE
+            )
+        else:
+            concurrent_upload(
+                files,
+                args.master_url,
+                DEFAULT_UPLOAD_ENDPOINT,
+                DEFAULT_ADMIN_SECRET,
+                args.concurrent,
+                args.timeout,
+                args.retry,
+                DEFAULT_CHUNK_SIZE
+            )
 
         upload_stats['end_time'] = time.time()
-        upload_stats['retry_count'] = sum(f['attempts'] - 1 for f in upload_stats['file_results'])
 
         print("")
         print("=" * 60)
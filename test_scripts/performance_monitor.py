@@ -4,22 +4,55 @@
 监控 Master 和 Worker 节点的运行状态
 """
 
+import os
+import re
+import signal
+import sys
+import collections
 import requests
+from requests.adapters import HTTPAdapter
 import time
 import json
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+# Worker 节点地址 (假设有3个worker)
+WORKER_URLS = [
+    "http://localhost:8081",
+    "http://localhost:8082",
+    "http://localhost:8083"
+]
+
+# 内存中保留的最近监控记录条数
+HISTORY_SIZE = 1024
+
+# Prometheus 文本格式的样本行：指标名（可带标签）+ 数值
+_PROM_RE = re.compile(r'^([^#\s][^\s{]*(?:\{[^}\n]*\})?)[ \t]+(\S+)$', re.M)
+
 class PerformanceMonitor:
-    def __init__(self, master_url="http://localhost:8080", interval=5):
+    def __init__(self, master_url="http://localhost:8080", interval=5,
+                 output_file='../test_videos/logs/monitor_data.jsonl', rotate_bytes=0):
         self.master_url = master_url
         self.interval = interval
-        self.metrics_history = []
+        self.output_file = output_file
+        self.rotate_bytes = rotate_bytes
+        # 每轮记录即时追加到 JSONL 文件，内存中只保留最近若干轮
+        self.metrics_history = collections.deque(maxlen=HISTORY_SIZE)
+        os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
+        # 行缓冲：每轮记录写完即落盘，进程被 kill 时已写入的数据不会丢失
+        self._fp = open(output_file, 'a', encoding='utf-8', buffering=1)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=8)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        # 每轮监控并发请求所有端点，单个节点超时不阻塞其他节点
+        self.executor = ThreadPoolExecutor(max_workers=8)
 
     def get_master_stats(self):
         """获取 Master 统计信息"""
         try:
-            response = requests.get(f"{self.master_url}/stats", timeout=2)
+            response = self.session.get(f"{self.master_url}/stats", timeout=2)
             if response.status_code == 200:
                 return response.json()
         except Exception as e:
@@ -29,7 +62,7 @@ class PerformanceMonitor:
     def get_master_metrics(self):
         """获取 Prometheus 格式的指标"""
         try:
-            response = requests.get(f"{self.master_url}/metrics", timeout=2)
+            response = self.session.get(f"{self.master_url}/metrics", timeout=2)
             if response.status_code == 200:
                 return self.parse_prometheus_metrics(response.text)
         except Exception as e:
@@ -39,22 +72,17 @@ class PerformanceMonitor:
     def parse_prometheus_metrics(self, metrics_text):
         """解析 Prometheus 格式的指标"""
         metrics = {}
-        for line in metrics_text.split('\n'):
-            if line and not line.startswith('#'):
-                parts = line.split()
-                if len(parts) == 2:
-                    name = parts[0]
-                    value = parts[1]
-                    try:
-                        metrics[name] = float(value)
-                    except ValueError:
-                        pass
+        for name, value in _PROM_RE.findall(metrics_text):
+            try:
+                metrics[name] = float(value)
+            except ValueError:
+                pass
         return metrics
 
     def get_worker_stats(self, worker_url):
         """获取 Worker 统计信息"""
         try:
-            response = requests.get(f"{worker_url}/metrics", timeout=2)
+            response = self.session.get(f"{worker_url}/metrics", timeout=2)
             if response.status_code == 200:
                 return self.parse_prometheus_metrics(response.text)
         except Exception as e:
@@ -83,8 +111,17 @@ class PerformanceMonitor:
                 print(f"\n[{iteration}] {current_time}")
                 print("-" * 80)
 
-                # 获取 Master 统计
-                stats = self.get_master_stats()
+                # 并发获取 Master 统计、Master 指标和各 Worker 指标
+                futures = {
+                    'master_stats': self.executor.submit(self.get_master_stats),
+                    'master_metrics': self.executor.submit(self.get_master_metrics),
+                    **{worker_url: self.executor.submit(self.get_worker_stats, worker_url)
+                       for worker_url in WORKER_URLS}
+                }
+                results = {key: future.result() for key, future in futures.items()}
+
+                # Master 统计
+                stats = results['master_stats']
                 if stats:
                     print(f"Master 统计:")
                     print(f"  活跃节点: {stats.get('active_nodes', 0)}")
@@ -94,8 +131,8 @@ class PerformanceMonitor:
                 else:
                     print("Master 统计: 获取失败")
 
-                # 获取 Master Prometheus 指标
-                metrics = self.get_master_metrics()
+                # Master Prometheus 指标
+                metrics = results['master_metrics']
                 if metrics:
                     print(f"\nMaster 指标:")
                     print(f"  系统状态: {metrics.get('mdfs_up', 0)}")
@@ -103,24 +140,6 @@ class PerformanceMonitor:
                     print(f"  文件总数: {metrics.get('mdfs_total_files', 0)}")
                     print(f"  副本不足文件: {metrics.get('mdfs_under_replicated_files', 0)}")
 
-                # 获取 Worker 统计 (假设有3个worker)
-                worker_urls = [
-                    "http://localhost:8081",
-                    "http://localhost:8082",
-                    "http://localhost:8083"
-                ]
-
-                print(f"\nWorker 状态:")
-                for i, worker_url in enumerate(worker_urls, 1):
-                    worker_metrics = self.get_worker_stats(worker_url)
-                    if worker_metrics:
-                        print(f"  Worker {i} ({worker_url}):")
-                        print(f"    文件数: {worker_metrics.get('mdfs_worker_files', 0)}")
-                        print(f"    存储量: {worker_metrics.get('mdfs_worker_bytes_total', 0) / 1024 / 1024:.2f} MB")
-                        print(f"    运行状态: {worker_metrics.get('mdfs_worker_up', 0)}")
-                    else:
-                        print(f"  Worker {i} ({worker_url}): 离线")
-
                 # 保存指标历史
                 metrics_data = {
                     'timestamp': datetime.now().isoformat(),
@@ -130,12 +149,20 @@ class PerformanceMonitor:
                     'worker_metrics': {}
                 }
 
-                for i, worker_url in enumerate(worker_urls, 1):
-                    worker_metrics = self.get_worker_stats(worker_url)
+                # Worker 统计
+                print(f"\nWorker 状态:")
+                for i, worker_url in enumerate(WORKER_URLS, 1):
+                    worker_metrics = results[worker_url]
                     if worker_metrics:
                         metrics_data['worker_metrics'][f'worker_{i}'] = worker_metrics
+                        print(f"  Worker {i} ({worker_url}):")
+                        print(f"    文件数: {worker_metrics.get('mdfs_worker_files', 0)}")
+                        print(f"    存储量: {worker_metrics.get('mdfs_worker_bytes_total', 0) / 1024 / 1024:.2f} MB")
+                        print(f"    运行状态: {worker_metrics.get('mdfs_worker_up', 0)}")
+                    else:
+                        print(f"  Worker {i} ({worker_url}): 离线")
 
-                self.metrics_history.append(metrics_data)
+                self.write_metrics(metrics_data)
 
                 # 检查是否达到监控时长
                 if duration > 0 and (time.time() - start_time) >= duration:
@@ -147,16 +174,41 @@ class PerformanceMonitor:
 
         except KeyboardInterrupt:
             print("\n\n用户中断监控")
+        finally:
+            self.executor.shutdown(wait=False)
 
         print("\n" + "=" * 80)
         print("监控结束")
         print("=" * 80)
 
-    def save_metrics(self, output_file):
-        """保存监控数据到文件"""
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(self.metrics_history, f, indent=2, ensure_ascii=False)
-        print(f"监控数据已保存到: {output_file}")
+    def write_metrics(self, metrics_data):
+        """追加一轮监控数据到 JSONL 文件"""
+        self._fp.write(json.dumps(metrics_data, ensure_ascii=False, separators=(',', ':')))
+        self._fp.write('\n')
+        self.metrics_history.append(metrics_data)
+
+        if self.rotate_bytes > 0 and self._fp.tell() >= self.rotate_bytes:
+            self.rotate()
+
+    def rotate(self):
+        """文件超过大小阈值时轮转，旧文件以时间戳为后缀保留"""
+        self._fp.close()
+        # 同一秒内多次轮转时追加序号，避免覆盖已轮转的文件
+        base = f"{self.output_file}.{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        target = base
+        seq = 1
+        while os.path.exists(target):
+            target = f"{base}.{seq}"
+            seq += 1
+        os.rename(self.output_file, target)
+        self._fp = open(self.output_file, 'a', encoding='utf-8', buffering=1)
+
+    def save_metrics(self):
+        """刷新并关闭监控数据文件"""
+        if self._fp.closed:
+            return
+        self._fp.close()
+        print(f"监控数据已保存到: {self.output_file}")
 
 def main():
     parser = argparse.ArgumentParser(description='性能监控脚本 - 监控分布式存储系统')
@@ -166,16 +218,23 @@ def main():
                        help='监控间隔（秒）(默认: 5)')
     parser.add_argument('--duration', type=int, default=0,
                        help='监控时长（秒），0=无限期 (默认: 0)')
-    parser.add_argument('--output', default='../test_videos/logs/monitor_data.json',
-                       help='监控数据输出文件 (默认: ../test_videos/logs/monitor_data.json)')
+    parser.add_argument('--output', default='../test_videos/logs/monitor_data.jsonl',
+                       help='监控数据输出文件，每行一条 JSON 记录 (默认: ../test_videos/logs/monitor_data.jsonl)')
+    parser.add_argument('--rotate_bytes', type=int, default=0,
+                       help='输出文件超过该字节数时轮转，0=不轮转 (默认: 0)')
 
     args = parser.parse_args()
 
-    monitor = PerformanceMonitor(args.master_url, args.interval)
-    monitor.monitor(args.duration)
+    monitor = PerformanceMonitor(args.master_url, args.interval, args.output, args.rotate_bytes)
+
+    # run_test.sh 通过 kill 停止监控，收到 SIGTERM 时同样关闭数据文件后退出
+    def on_sigterm(signum, frame):
+        monitor.save_metrics()
+        sys.exit(0)
 
-    if monitor.metrics_history:
-        monitor.save_metrics(args.output)
+    signal.signal(signal.SIGTERM, on_sigterm)
+    monitor.monitor(args.duration)
+    monitor.save_metrics()
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
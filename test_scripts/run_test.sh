@@ -134,13 +134,19 @@ echo -e "${GREEN}步骤 3: 启动性能监控${NC}"
 echo -e "${GREEN}========================================${NC}"
 echo ""
 
+# 监控数据为 JSONL（每行一条记录），以追加方式写入；上一次运行的数据先按时间戳改名保留
+MONITOR_DATA="../test_videos/logs/monitor_data.jsonl"
+if [ -s "$MONITOR_DATA" ]; then
+    mv "$MONITOR_DATA" "$MONITOR_DATA.$(date +%Y%m%d_%H%M%S)"
+fi
+
 # 启动监控（后台运行）
 echo "启动性能监控..."
-python3 performance_monitor.py --duration 1200 --output "../test_videos/logs/monitor_data.json" &
+python3 performance_monitor.py --duration 1200 --output "$MONITOR_DATA" &
 MONITOR_PID=$!
 echo "✓ 监控已启动 (PID: $MONITOR_PID)"
 echo "  监控时长: 20分钟"
-echo "  监控数据将保存到: ../test_videos/logs/monitor_data.json"
+echo "  监控数据将保存到: $MONITOR_DATA（每行一条 JSON 记录）"
 echo ""
 
 # 等待监控启动
@@ -191,12 +197,12 @@ echo ""
 echo "测试报告:"
 ls -lh "../test_videos/logs/upload_report_"*.md 2>/dev/null | tail -1 | awk '{print "  Markdown: " $NF}'
 ls -lh "../test_videos/logs/upload_metrics_"*.json 2>/dev/null | tail -1 | awk '{print "  JSON: " $NF}'
-ls -lh "../test_videos/logs/monitor_data.json" 2>/dev/null | awk '{print "  监控数据: " $NF}'
+ls -lh "$MONITOR_DATA" 2>/dev/null | awk '{print "  监控数据: " $NF}'
 
 echo ""
 echo "下一步:"
 echo "  1. 查看测试报告: cat ../test_videos/logs/upload_report_*.md"
-echo "  2. 查看监控数据: cat ../test_videos/logs/monitor_data.json"
+echo "  2. 查看监控数据: cat $MONITOR_DATA（JSONL，每行一轮监控记录）"
 echo "  3. 运行墓碑机制测试: 参考 README.md"
 echo "  4. 清理测试数据: rm -rf ../test_videos/split_output/*"
 
@@ -8,21 +8,88 @@ import os
 os.environ['NO_PROXY'] = 'localhost,127.0.0.1'
 os.environ['no_proxy'] = 'localhost,127.0.0.1'
 
+import atexit
 import requests
+try:
+    import orjson
+except ImportError:
+    orjson = None
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import subprocess
 import time
 import json
 import sys
 import re
+import selectors
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
+from urllib.parse import urlsplit
+
+from _common import default_test_files, log_timestamp
+
+# Master 在节点重新注册时输出的清理事件，捕获被清理的文件名
+_CLEANUP_RE = re.compile(r"墓碑机制：自动删除重启节点上的残留文件 (.+?)\s*$".encode('utf-8'))
+
+@dataclass
+class CaseSummary:
+    """单个测试场景的结果汇总"""
+    # 显式声明 __slots__（dataclass 的 slots 参数需要 Python 3.10+）
+    __slots__ = ('executed', 'status_passed', 'tombstone_created', 'auto_cleanup',
+                 'partial_failure_detected', 'duration')
+    executed: bool
+    status_passed: bool
+    tombstone_created: bool
+    auto_cleanup: bool
+    partial_failure_detected: bool
+    duration: float
+
+    @property
+    def passed(self):
+        return self.status_passed and self.tombstone_created and self.auto_cleanup
+
+    @classmethod
+    def from_results(cls, results):
+        return cls(
+            executed=bool(results),
+            status_passed=results.get('status') == 'passed',
+            tombstone_created=bool(results.get('tombstone_created')),
+            auto_cleanup=bool(results.get('auto_cleanup')),
+            partial_failure_detected=bool(results.get('partial_failure_detected')),
+            duration=results.get('duration', 0),
+        )
+
+
+@dataclass
+class SummaryReport:
+    """整体结果汇总：verify_results 计算一次，报告直接读取"""
+    __slots__ = ('test_4_1', 'test_4_2')
+    test_4_1: CaseSummary
+    test_4_2: CaseSummary
+
+    @property
+    def all_passed(self):
+        return self.test_4_1.passed and self.test_4_2.passed
+
 
 class TombstoneTestRunner:
     def __init__(self, master_url="http://localhost:8080", secret="admin888"):
         self.master_url = master_url
         self.secret = secret
+        # 复用 keep-alive 连接，连接失败时短暂退避重试
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=16,
+                              max_retries=Retry(total=2, backoff_factor=0.1))
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        atexit.register(self.session.close)
         self.log_dir = Path("../test_videos/logs/tombstone")
         self.log_dir.mkdir(parents=True, exist_ok=True)
+        # 日志文件整个运行期间保持打开，行缓冲保证每条日志及时落盘
+        self._log_fh = (self.log_dir / "test_log.txt").open("a", buffering=1, encoding="utf-8")
+        atexit.register(self._log_fh.close)
         self.test_results = {
             'test_4_1': {},
             'test_4_2': {},
@@ -31,24 +98,57 @@ class TombstoneTestRunner:
         }
         self.start_time = None
         self.end_time = None
+        self.summary = None
+        # 各 Worker 的容器名与容器内数据目录（worker 以 ./data_<端口> 存储，工作目录为 /root）
+        self.workers = ('worker1', 'worker2', 'worker3')
+        self._worker_container = {w: f"movie-dist-kv-{w}-1" for w in self.workers}
+        self._worker_datadir = {w: f"/root/data_808{w[-1]}" for w in self.workers}
+        # 日志游标（按服务）：只关心本次运行开始之后、且上次扫描之后的日志
+        self._log_since = datetime.now().isoformat(timespec='seconds')
+        self._log_cursor = {}
 
     def log(self, message, level="INFO"):
         """记录日志到文件和标准输出"""
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        log_entry = f"[{timestamp}] [{level}] {message}"
+        log_entry = f"[{log_timestamp()}] [{level}] {message}"
         print(log_entry)
-        with open(self.log_dir / "test_log.txt", "a") as f:
-            f.write(log_entry + "\n")
+        self._log_fh.write(log_entry + "\n")
+
+    def _count_running_containers(self):
+        """统计运行中的容器数量
+
+        Compose v2 使用 JSON 输出；docker-compose v1 不支持 --format/--status，回退到解析表格中的 Up 状态。
+        """
+        result = subprocess.run(
+            ['docker-compose', 'ps', '--format', 'json', '--status', 'running'],
+            capture_output=True, text=True, cwd='..'
+        )
+        if result.returncode == 0:
+            output = result.stdout.strip()
+            # 早期 v2 输出 JSON 数组，新版每行一个 JSON 对象
+            if output.startswith('['):
+                return len(json.loads(output))
+            return sum(1 for line in output.splitlines() if line)
+
+        result = subprocess.run(['docker-compose', 'ps'], capture_output=True, text=True, cwd='..')
+        if result.returncode != 0:
+            return 0
+        # 跳过表头与分隔线，State 列为 Up 的行即运行中的容器
+        return sum(1 for line in result.stdout.splitlines()[2:] if re.search(r'\bUp\b', line))
 
     def check_environment(self):
         """检查测试环境"""
         self.log("开始环境检查...")
         
-        # 检查 Docker 容器状态
+        # 容器状态与 Master 健康检查互不依赖，并行执行
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            ps_future = executor.submit(self._count_running_containers)
+            health_future = executor.submit(self.session.get, f"{self.master_url}/health", timeout=5)
+
+        # 检查 Docker 容器状态（master + 3 个 worker）
         try:
-            result = subprocess.run(['docker-compose', 'ps'], capture_output=True, text=True, cwd='..')
-            if result.returncode != 0 or 'Up' not in result.stdout:
-                self.log("Docker 容器未运行，请先启动：docker-compose up -d", "ERROR")
+            running = ps_future.result()
+            if running < 4:
+                self.log(f"Docker 容器未全部运行（{running}/4），请先启动：docker-compose up -d", "ERROR")
                 return False
             self.log("✓ Docker 容器运行正常")
         except Exception as e:
@@ -57,7 +157,7 @@ class TombstoneTestRunner:
 
         # 检查 Master 健康状态
         try:
-            response = requests.get(f"{self.master_url}/health", timeout=5)
+            response = health_future.result()
             if response.status_code != 200:
                 self.log("Master 健康检查失败", "ERROR")
                 return False
@@ -68,7 +168,7 @@ class TombstoneTestRunner:
 
         # 检查当前文件数量
         try:
-            stats = requests.get(f"{self.master_url}/stats", timeout=5).json()
+            stats = self.session.get(f"{self.master_url}/stats", timeout=5).json()
             file_count = stats.get('total_files', 0)
             self.log(f"当前文件数量: {file_count}")
             if file_count < 20:
@@ -84,7 +184,7 @@ class TombstoneTestRunner:
         params = {'name': filename, 'secret': self.secret}
         
         try:
-            response = requests.get(url, params=params, timeout=10)
+            response = self.session.get(url, params=params, timeout=10)
             return {
                 'file': filename,
                 'status': response.status_code,
@@ -99,33 +199,65 @@ class TombstoneTestRunner:
                 'timestamp': datetime.now().isoformat()
             }
 
+    def delete_files(self, filenames):
+        """批量删除文件：优先调用 Master 的 /delete_batch 接口，不支持时并行逐个删除"""
+        try:
+            response = self.session.post(
+                f"{self.master_url}/delete_batch",
+                json={'names': filenames, 'secret': self.secret},
+                timeout=30
+            )
+            if response.status_code == 200:
+                statuses = response.json()
+                timestamp = datetime.now().isoformat()
+                results = []
+                for filename in filenames:
+                    item = statuses.get(filename, {'status': -1, 'response': '无返回结果'})
+                    results.append({
+                        'file': filename,
+                        'status': item['status'],
+                        'response': item['response'],
+                        'timestamp': timestamp
+                    })
+                return results
+            self.log(f"批量删除接口不可用 (HTTP {response.status_code})，改为逐个删除", "WARN")
+        except Exception as e:
+            self.log(f"批量删除失败: {e}，改为逐个删除", "WARN")
+
+        # 删除请求以等待 Master 为主，并行发出，共用 Session 的连接池
+        with ThreadPoolExecutor(max_workers=max(1, min(len(filenames), 16))) as executor:
+            return list(executor.map(self.delete_file, filenames))
+
     def get_stats(self):
         """获取 Master 统计信息"""
         try:
-            response = requests.get(f"{self.master_url}/stats", timeout=5)
+            response = self.session.get(f"{self.master_url}/stats", timeout=5)
             return response.json()
         except Exception as e:
             self.log(f"获取统计信息失败: {e}", "ERROR")
             return {}
 
-    def get_worker_files(self, worker_name):
-        """获取 Worker 节点上的文件列表"""
-        container_name = f"movie-dist-kv-{worker_name}-1"
-        data_dir = f"/root/data_{worker_name[-1]}{worker_name[-1]}"
-        
+    def get_all_worker_files(self, workers=None):
+        """在一次 shell 调用中获取多个 Worker 节点上的文件列表，返回 {节点: 文件列表}"""
+        workers = workers or self.workers
+        script = '; '.join(
+            f"echo ==={w}===; docker exec {self._worker_container[w]} ls {self._worker_datadir[w]}"
+            for w in workers
+        )
+        all_files = {w: [] for w in workers}
         try:
-            result = subprocess.run(
-                ['docker', 'exec', container_name, 'ls', data_dir],
-                capture_output=True, text=True
-            )
-            
-            if result.returncode == 0:
-                files = [f for f in result.stdout.strip().split('\n') if f]
-                return files
-            return []
+            result = subprocess.run(['bash', '-c', script], capture_output=True, text=True)
         except Exception as e:
-            self.log(f"获取 {worker_name} 文件列表失败: {e}", "ERROR")
-            return []
+            self.log(f"获取 Worker 文件列表失败: {e}", "ERROR")
+            return all_files
+
+        current = None
+        for line in result.stdout.split('\n'):
+            if line.startswith('===') and line.endswith('===') and line[3:-3] in all_files:
+                current = all_files[line[3:-3]]
+            elif line and current is not None:
+                current.append(line)
+        return all_files
 
     def stop_worker(self, worker_name):
         """停止 Worker 节点"""
@@ -161,57 +293,119 @@ class TombstoneTestRunner:
             self.log(f"启动 {worker_name} 异常: {e}", "ERROR")
             return False
 
-    def get_worker_logs(self, worker_name, pattern=""):
-        """获取 Worker 日志"""
+    def wait_for_worker(self, worker_name, since, timeout=20):
+        """轮询 Master 的 /nodes 接口，直到该 Worker 在 since（Unix 秒）之后发出过心跳"""
+        port = 8080 + int(worker_name[-1])
+        since_ms = since * 1000
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                nodes = self.session.get(f"{self.master_url}/nodes", timeout=2).json()
+                for node in nodes.get('active', []):
+                    if urlsplit(node['addr']).port == port and node['last_seen'] >= since_ms:
+                        self.log(f"✓ {worker_name} 已重新注册")
+                        return True
+            except Exception:
+                pass
+            time.sleep(0.5)
+
+        self.log(f"等待 {worker_name} 重新注册超时（{timeout} 秒）", "WARN")
+        return False
+
+    def scan_worker_logs(self, worker_name, *needles):
+        """流式扫描日志中的关键字，返回出现过的关键字集合
+
+        全部关键字都找到后立即停止读取，不会在内存中保留日志行。
+        按节点记录游标，每次只扫描该节点上次扫描之后的新日志，与关键字无关。
+        """
+        since = self._log_cursor.get(worker_name, self._log_since)
+        now = datetime.now().isoformat(timespec='microseconds')
+        wanted = {needle.encode('utf-8'): needle for needle in needles}
+        found = set()
         try:
-            result = subprocess.run(
-                ['docker-compose', 'logs', worker_name],
-                capture_output=True, text=True, cwd='..'
+            proc = subprocess.Popen(
+                ['docker-compose', 'logs', '--no-color', f'--since={since}', worker_name],
+                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, cwd='..'
             )
-            
-            if pattern:
-                lines = result.stdout.split('\n')
-                matched = [line for line in lines if pattern in line]
-                return matched
-            return result.stdout
         except Exception as e:
             self.log(f"获取 {worker_name} 日志失败: {e}", "ERROR")
-            return ""
+            return found
+
+        try:
+            for raw in proc.stdout:
+                for needle_b in [b for b in wanted if b in raw]:
+                    found.add(wanted.pop(needle_b))
+                if not wanted:
+                    break
+        finally:
+            proc.terminate()
+            proc.wait()
+        self._log_cursor[worker_name] = now
+        return found
+
+    def check_auto_cleanup(self, workers, target_files, timeout=30, since=None):
+        """检查自动清理机制
 
-    def check_auto_cleanup(self, workers, target_files, timeout=30):
-        """检查自动清理机制"""
+        墓碑清理事件由 Master 在节点重新注册时输出，这里持续跟踪 Master 日志，
+        节点上残留的目标文件全部出现清理事件后立即返回，而不是定时轮询。
+        """
         self.log(f"等待自动清理（最多 {timeout} 秒）...")
-        
-        start_time = time.time()
+
+        deadline = time.monotonic() + timeout
         cleanup_events = []
-        
-        while time.time() - start_time < timeout:
-            time.sleep(5)
-            
-            for worker in workers:
-                logs = self.get_worker_logs(worker, "墓碑机制")
-                for log in logs:
-                    # 检查是否有自动删除事件
-                    if "墓碑机制：自动删除" in log and log not in cleanup_events:
-                        cleanup_events.append(log)
-                        self.log(f"发现自动清理事件: {worker} - {log[:100]}")
-            
-            # 检查目标文件是否已被清理
-            all_clean = True
-            for worker in workers:
-                files = self.get_worker_files(worker)
-                for target in target_files:
-                    if target in files:
-                        all_clean = False
-                        break
-                if not all_clean:
+        seen = set()
+        cleaned = set()
+
+        # 只需等待确实残留在这些节点上的目标文件
+        targets = set(target_files)
+        remaining = set()
+        for files in self.get_all_worker_files(workers).values():
+            remaining.update(targets.intersection(files))
+
+        cmd = ['docker-compose', 'logs', '-f', '--no-color']
+        cmd.append(f'--since={since}' if since else '--tail=0')
+        cmd.append('master')
+        try:
+            proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, cwd='..')
+        except Exception as e:
+            self.log(f"跟踪 master 日志失败: {e}", "ERROR")
+            return False, cleanup_events
+
+        selector = selectors.DefaultSelector()
+        selector.register(proc.stdout, selectors.EVENT_READ)
+        fd = proc.stdout.fileno()
+        pending = b''
+        try:
+            while not remaining <= cleaned:
+                left = deadline - time.monotonic()
+                if left <= 0:
                     break
-            
-            if all_clean:
-                self.log("✓ 所有目标文件已自动清理")
-                return True, cleanup_events
-        
-        return False, cleanup_events
+                if not selector.select(timeout=left):
+                    continue
+                chunk = os.read(fd, 65536)
+                if not chunk:
+                    break
+                *lines, pending = (pending + chunk).split(b'\n')
+                for raw in lines:
+                    m = _CLEANUP_RE.search(raw)
+                    if m and raw not in seen:
+                        seen.add(raw)
+                        log = raw.decode('utf-8', 'replace')
+                        cleanup_events.append(log)
+                        cleaned.add(m.group(1).decode('utf-8', 'replace'))
+                        self.log(f"发现自动清理事件: {log[:100]}")
+        finally:
+            selector.close()
+            proc.terminate()
+            proc.wait()
+
+        # 以磁盘上的实际状态为准做最终确认
+        for files in self.get_all_worker_files(workers).values():
+            if not targets.isdisjoint(files):
+                return False, cleanup_events
+
+        self.log("✓ 所有目标文件已自动清理")
+        return True, cleanup_events
 
     def run_test_4_1(self):
         """测试4.1：删除后重启测试"""
@@ -220,7 +414,7 @@ class TombstoneTestRunner:
         self.log("=" * 60)
         
         test_start = datetime.now()
-        test_files = [f"test_movie_{i:04d}.mp4" for i in range(10)]
+        test_files = default_test_files(10)
         
         self.test_results['test_4_1']['test_files'] = test_files
         self.test_results['test_4_1']['start_time'] = test_start.isoformat()
@@ -236,53 +430,55 @@ class TombstoneTestRunner:
         if not self.stop_worker('worker2'):
             self.test_results['test_4_1']['status'] = 'failed'
             return False
-        time.sleep(5)
         
         # 步骤3：删除文件
         self.log("\n步骤3: 删除文件")
-        delete_results = []
-        for filename in test_files:
-            result = self.delete_file(filename)
-            delete_results.append(result)
+        delete_results = self.delete_files(test_files)
+        for result in delete_results:
             status_str = "✓" if result['status'] == 200 else "✗"
-            self.log(f"  {status_str} {filename}: {result.get('response', result.get('error', ''))}")
-            time.sleep(0.5)
+            self.log(f"  {status_str} {result['file']}: {result.get('response', result.get('error', ''))}")
         
         self.test_results['test_4_1']['delete_results'] = delete_results
         
         # 步骤4：验证墓碑记录
         self.log("\n步骤4: 验证墓碑记录")
-        master_logs = self.get_worker_logs('master', '墓碑')
-        tombstone_created = any('创建墓碑' in log for log in master_logs)
+        tombstone_created = '创建墓碑' in self.scan_worker_logs('master', '创建墓碑')
         self.log(f"墓碑记录已创建: {'是' if tombstone_created else '否'}")
         
         # 步骤5：重启 Worker2
         self.log("\n步骤5: 重启 Worker2")
+        restart_time = datetime.now()
         if not self.start_worker('worker2'):
             self.test_results['test_4_1']['status'] = 'failed'
             return False
-        time.sleep(10)
+        self.wait_for_worker('worker2', restart_time.timestamp())
         
         # 步骤6：检查自动清理
         self.log("\n步骤6: 检查自动清理")
-        cleaned, cleanup_events = self.check_auto_cleanup(['worker2'], test_files, timeout=30)
+        cleaned, cleanup_events = self.check_auto_cleanup(['worker2'], test_files, timeout=30,
+                                                          since=restart_time.strftime('%Y-%m-%dT%H:%M:%S'))
         
         self.test_results['test_4_1']['auto_cleanup'] = cleaned
         self.test_results['test_4_1']['cleanup_events'] = cleanup_events
         
         # 步骤7：最终验证
         self.log("\n步骤7: 最终验证")
+        # 节点文件列表与 Master 统计互不依赖，并行获取
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            files_future = executor.submit(self.get_all_worker_files)
+            stats_future = executor.submit(self.get_stats)
+
         all_workers_clean = True
-        for worker in ['worker1', 'worker2', 'worker3']:
-            files = self.get_worker_files(worker)
-            found_files = [f for f in test_files if f in files]
+        targets = set(test_files)
+        for worker, files in files_future.result().items():
+            found_files = sorted(targets.intersection(files))
             if found_files:
                 self.log(f"  {worker}: ✗ 发现残留文件 {found_files}", "ERROR")
                 all_workers_clean = False
             else:
                 self.log(f"  {worker}: ✓ 无残留文件")
         
-        final_stats = self.get_stats()
+        final_stats = stats_future.result()
         self.log(f"最终文件数: {final_stats.get('total_files', 0)}")
         
         test_end = datetime.now()
@@ -305,7 +501,7 @@ class TombstoneTestRunner:
         self.log("=" * 60)
         
         test_start = datetime.now()
-        test_files = [f"test_movie_{i:04d}.mp4" for i in range(10, 20)]
+        test_files = default_test_files(10, start=10)
         
         self.test_results['test_4_2']['test_files'] = test_files
         self.test_results['test_4_2']['start_time'] = test_start.isoformat()
@@ -320,57 +516,61 @@ class TombstoneTestRunner:
         if not (self.stop_worker('worker1') and self.stop_worker('worker2')):
             self.test_results['test_4_2']['status'] = 'failed'
             return False
-        time.sleep(10)
         
         # 步骤3：删除文件（部分会失败）
         self.log("\n步骤3: 删除文件（部分将失败）")
-        delete_results = []
-        for filename in test_files:
-            result = self.delete_file(filename)
-            delete_results.append(result)
+        delete_results = self.delete_files(test_files)
+        for result in delete_results:
             status_str = "✓" if result['status'] == 200 else "✗"
-            self.log(f"  {status_str} {filename}: {result.get('response', result.get('error', ''))}")
-            time.sleep(0.5)
+            self.log(f"  {status_str} {result['file']}: {result.get('response', result.get('error', ''))}")
         
         self.test_results['test_4_2']['delete_results'] = delete_results
         
         # 步骤4：验证部分删除失败处理
         self.log("\n步骤4: 验证部分删除失败处理")
-        master_logs = self.get_worker_logs('master', '部分删除失败')
-        partial_failure = any('部分删除失败' in log for log in master_logs)
+        # 一次扫描 Master 日志，同时检查两个关键字
+        markers = self.scan_worker_logs('master', '部分删除失败', '创建墓碑')
+        partial_failure = '部分删除失败' in markers
         self.log(f"检测到部分删除失败: {'是' if partial_failure else '否'}")
         
-        tombstone_logs = self.get_worker_logs('master', '墓碑')
-        tombstone_created = any('创建墓碑' in log for log in tombstone_logs)
+        tombstone_created = '创建墓碑' in markers
         self.log(f"墓碑记录已创建: {'是' if tombstone_created else '否'}")
         
         # 步骤5：重启 Worker1 和 Worker2
         self.log("\n步骤5: 重启 Worker1 和 Worker2")
+        restart_time = datetime.now()
         if not (self.start_worker('worker1') and self.start_worker('worker2')):
             self.test_results['test_4_2']['status'] = 'failed'
             return False
-        time.sleep(10)
+        for worker in ('worker1', 'worker2'):
+            self.wait_for_worker(worker, restart_time.timestamp())
         
         # 步骤6：检查自动清理
         self.log("\n步骤6: 检查自动清理")
-        cleaned, cleanup_events = self.check_auto_cleanup(['worker1', 'worker2'], test_files, timeout=30)
+        cleaned, cleanup_events = self.check_auto_cleanup(['worker1', 'worker2'], test_files, timeout=30,
+                                                          since=restart_time.strftime('%Y-%m-%dT%H:%M:%S'))
         
         self.test_results['test_4_2']['auto_cleanup'] = cleaned
         self.test_results['test_4_2']['cleanup_events'] = cleanup_events
         
         # 步骤7：最终验证
         self.log("\n步骤7: 最终验证")
+        # 节点文件列表与 Master 统计互不依赖，并行获取
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            files_future = executor.submit(self.get_all_worker_files)
+            stats_future = executor.submit(self.get_stats)
+
         all_workers_clean = True
-        for worker in ['worker1', 'worker2', 'worker3']:
-            files = self.get_worker_files(worker)
-            found_files = [f for f in test_files if f in files]
+        targets = set(test_files)
+        for worker, files in files_future.result().items():
+            found_files = sorted(targets.intersection(files))
             if found_files:
                 self.log(f"  {worker}: ✗ 发现残留文件 {found_files}", "ERROR")
                 all_workers_clean = False
             else:
                 self.log(f"  {worker}: ✓ 无残留文件")
         
-        final_stats = self.get_stats()
+        final_stats = stats_future.result()
         self.log(f"最终文件数: {final_stats.get('total_files', 0)}")
         
         test_end = datetime.now()
@@ -387,26 +587,29 @@ class TombstoneTestRunner:
         
         return all_workers_clean
 
+    def summarize(self):
+        """根据 test_results 计算结果汇总"""
+        return SummaryReport(
+            test_4_1=CaseSummary.from_results(self.test_results['test_4_1']),
+            test_4_2=CaseSummary.from_results(self.test_results['test_4_2']),
+        )
+
     def verify_results(self):
         """验证测试结果"""
         self.log("\n" + "=" * 60)
         self.log("验证测试结果")
         self.log("=" * 60)
         
+        self.summary = summary = self.summarize()
         verification = {
-            'test_4_1': {},
-            'test_4_2': {},
-            'overall': {}
+            'test_4_1': {'passed': summary.test_4_1.passed},
+            'test_4_2': {'passed': summary.test_4_2.passed},
+            'overall': {'all_passed': summary.all_passed}
         }
         
         # 验证测试4.1
         test_4_1 = self.test_results['test_4_1']
-        if test_4_1:
-            verification['test_4_1']['passed'] = (
-                test_4_1.get('status') == 'passed' and
-                test_4_1.get('tombstone_created') and
-                test_4_1.get('auto_cleanup')
-            )
+        if summary.test_4_1.executed:
             verification['test_4_1']['details'] = {
                 'status': test_4_1.get('status'),
                 'tombstone_created': test_4_1.get('tombstone_created'),
@@ -414,17 +617,11 @@ class TombstoneTestRunner:
                 'duration': test_4_1.get('duration')
             }
         else:
-            verification['test_4_1']['passed'] = False
             verification['test_4_1']['details'] = {'error': '测试4.1未执行或数据缺失'}
 
         # 验证测试4.2
         test_4_2 = self.test_results['test_4_2']
-        if test_4_2:
-            verification['test_4_2']['passed'] = (
-                test_4_2.get('status') == 'passed' and
-                test_4_2.get('tombstone_created') and
-                test_4_2.get('auto_cleanup')
-            )
+        if summary.test_4_2.executed:
             verification['test_4_2']['details'] = {
                 'status': test_4_2.get('status'),
                 'tombstone_created': test_4_2.get('tombstone_created'),
@@ -433,114 +630,116 @@ class TombstoneTestRunner:
                 'duration': test_4_2.get('duration')
             }
         else:
-            verification['test_4_2']['passed'] = False
             verification['test_4_2']['details'] = {'error': '测试4.2未执行或数据缺失'}
         
-        # 整体验证
-        verification['overall']['all_passed'] = (
-            verification['test_4_1']['passed'] and
-            verification['test_4_2']['passed']
-        )
-        
         self.test_results['verification'] = verification
         
         self.log(f"\n验证结果:")
-        self.log(f"  测试4.1: {'✓ 通过' if verification['test_4_1']['passed'] else '✗ 失败'}")
-        self.log(f"  测试4.2: {'✓ 通过' if verification['test_4_2']['passed'] else '✗ 失败'}")
-        self.log(f"  整体结果: {'✓ 通过' if verification['overall']['all_passed'] else '✗ 失败'}")
+        self.log(f"  测试4.1: {'✓ 通过' if summary.test_4_1.passed else '✗ 失败'}")
+        self.log(f"  测试4.2: {'✓ 通过' if summary.test_4_2.passed else '✗ 失败'}")
+        self.log(f"  整体结果: {'✓ 通过' if summary.all_passed else '✗ 失败'}")
         
-        return verification['overall']['all_passed']
+        return summary.all_passed
 
     def generate_report(self):
         """生成 Markdown 格式测试报告"""
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        report_file = self.log_dir / f"tombstone_test_report_{timestamp}.md"
-        
-        with open(report_file, 'w', encoding='utf-8') as f:
-            f.write("# 墓碑机制验证测试报告\n\n")
-            f.write(f"**生成时间**: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
-            
+        now = datetime.now()
+        report_file = self.log_dir / f"tombstone_test_report_{now.strftime('%Y%m%d_%H%M%S')}.md"
+
+        def delete_table(results):
+            return [
+                f"| {r['file']} | {'✓' if r['status'] == 200 else '✗'} | {r.get('response', r.get('error', ''))[:50]} |\n"
+                for r in results
+            ]
+
+        parts = [
+            "# 墓碑机制验证测试报告\n\n",
+            f"**生成时间**: {now.strftime('%Y-%m-%d %H:%M:%S')}\n\n",
             # 测试概览
-            f.write("## 测试概览\n\n")
-            f.write(f"- **测试开始时间**: {self.start_time}\n")
-            if self.end_time:
-                f.write(f"- **测试结束时间**: {self.end_time}\n")
-                if self.start_time:
-                    duration = self.end_time - self.start_time
-                    f.write(f"- **总测试时长**: {duration.total_seconds():.1f}秒\n")
-            else:
-                f.write("- **测试结束时间**: 未完成\n")
-                f.write("- **总测试时长**: 未完成\n")
-            f.write(f"- **测试文件数量**: 20 个\n")
-            f.write(f"- **Master URL**: {self.master_url}\n\n")
-            
-            # 测试4.1结果
-            test_4_1 = self.test_results['test_4_1']
-            f.write("## 测试 4.1: 删除后重启测试\n\n")
-            f.write(f"- **状态**: {'✓ 通过' if test_4_1.get('status') == 'passed' else '✗ 失败'}\n")
-            f.write(f"- **墓碑创建**: {'✓ 是' if test_4_1.get('tombstone_created') else '✗ 否'}\n")
-            f.write(f"- **自动清理**: {'✓ 成功' if test_4_1.get('auto_cleanup') else '✗ 失败'}\n")
-            f.write(f"- **测试时长**: {test_4_1.get('duration', 0):.1f}秒\n")
-            f.write(f"- **测试文件**: test_movie_0000.mp4 到 test_movie_0009.mp4\n\n")
-            
-            f.write("### 删除操作详情\n\n")
-            f.write("| 文件名 | 状态 | 响应 |\n")
-            f.write("|--------|------|------|\n")
-            for result in test_4_1.get('delete_results', []):
-                status_icon = "✓" if result['status'] == 200 else "✗"
-                response = result.get('response', result.get('error', ''))[:50]
-                f.write(f"| {result['file']} | {status_icon} | {response} |\n")
-            f.write("\n")
-            
-            # 测试4.2结果
-            test_4_2 = self.test_results['test_4_2']
-            f.write("## 测试 4.2: 部分删除失败测试\n\n")
-            f.write(f"- **状态**: {'✓ 通过' if test_4_2.get('status') == 'passed' else '✗ 失败'}\n")
-            f.write(f"- **墓碑创建**: {'✓ 是' if test_4_2.get('tombstone_created') else '✗ 否'}\n")
-            f.write(f"- **部分失败检测**: {'✓ 是' if test_4_2.get('partial_failure_detected') else '✗ 否'}\n")
-            f.write(f"- **自动清理**: {'✓ 成功' if test_4_2.get('auto_cleanup') else '✗ 失败'}\n")
-            f.write(f"- **测试时长**: {test_4_2.get('duration', 0):.1f}秒\n")
-            f.write(f"- **测试文件**: test_movie_0010.mp4 到 test_movie_0019.mp4\n\n")
-            
-            f.write("### 删除操作详情\n\n")
-            f.write("| 文件名 | 状态 | 响应 |\n")
-            f.write("|--------|------|------|\n")
-            for result in test_4_2.get('delete_results', []):
-                status_icon = "✓" if result['status'] == 200 else "✗"
-                response = result.get('response', result.get('error', ''))[:50]
-                f.write(f"| {result['file']} | {status_icon} | {response} |\n")
-            f.write("\n")
-            
-            # 验证结果
-            verification = self.test_results.get('verification', {})
-            f.write("## 验证结果\n\n")
-            f.write(f"- **测试4.1**: {'✓ 通过' if verification.get('test_4_1', {}).get('passed') else '✗ 失败'}\n")
-            f.write(f"- **测试4.2**: {'✓ 通过' if verification.get('test_4_2', {}).get('passed') else '✗ 失败'}\n")
-            f.write(f"- **整体结果**: {'✓ 全部通过' if verification.get('overall', {}).get('all_passed') else '✗ 存在失败'}\n\n")
-            
-            # 测试结论
-            f.write("## 测试结论\n\n")
-            if verification.get('overall', {}).get('all_passed'):
-                f.write("### ✅ 测试通过\n\n")
-                f.write("墓碑机制验证测试完全通过，所有验证项均满足要求：\n\n")
-                f.write("1. ✓ 删除后重启机制正常工作\n")
-                f.write("2. ✓ 墓碑记录正确创建\n")
-                f.write("3. ✓ 残留文件自动清理\n")
-                f.write("4. ✓ 部分删除失败正确处理\n")
-                f.write("5. ✓ 文件索引保持一致性\n\n")
-                f.write("系统墓碑机制功能完善，能够有效防止文件'复活'问题。\n")
-            else:
-                f.write("### ❌ 测试失败\n\n")
-                f.write("墓碑机制验证测试存在问题，需要检查以下方面：\n\n")
-                if not verification.get('test_4_1', {}).get('passed'):
-                    f.write("1. ✗ 测试4.1失败：检查删除后重启机制\n")
-                if not verification.get('test_4_2', {}).get('passed'):
-                    f.write("2. ✗ 测试4.2失败：检查部分删除失败处理\n")
-                f.write("\n建议：\n")
-                f.write("- 查看 Master 和 Worker 日志\n")
-                f.write("- 检查文件索引状态\n")
-                f.write("- 验证墓碑记录创建逻辑\n")
-        
+            "## 测试概览\n\n",
+            f"- **测试开始时间**: {self.start_time}\n",
+        ]
+        if self.end_time:
+            parts.append(f"- **测试结束时间**: {self.end_time}\n")
+            if self.start_time:
+                duration = self.end_time - self.start_time
+                parts.append(f"- **总测试时长**: {duration.total_seconds():.1f}秒\n")
+        else:
+            parts.append("- **测试结束时间**: 未完成\n- **总测试时长**: 未完成\n")
+        parts.append(f"- **测试文件数量**: 20 个\n- **Master URL**: {self.master_url}\n\n")
+
+        summary = self.summary or self.summarize()
+
+        # 测试4.1结果
+        t41 = summary.test_4_1
+        parts.append(
+            "## 测试 4.1: 删除后重启测试\n\n"
+            f"- **状态**: {'✓ 通过' if t41.status_passed else '✗ 失败'}\n"
+            f"- **墓碑创建**: {'✓ 是' if t41.tombstone_created else '✗ 否'}\n"
+            f"- **自动清理**: {'✓ 成功' if t41.auto_cleanup else '✗ 失败'}\n"
+            f"- **测试时长**: {t41.duration:.1f}秒\n"
+            "- **测试文件**: test_movie_0000.mp4 到 test_movie_0009.mp4\n\n"
+            "### 删除操作详情\n\n"
+            "| 文件名 | 状态 | 响应 |\n"
+            "|--------|------|------|\n"
+        )
+        parts.extend(delete_table(self.test_results['test_4_1'].get('delete_results', [])))
+        parts.append("\n")
+
+        # 测试4.2结果
+        t42 = summary.test_4_2
+        parts.append(
+            "## 测试 4.2: 部分删除失败测试\n\n"
+            f"- **状态**: {'✓ 通过' if t42.status_passed else '✗ 失败'}\n"
+            f"- **墓碑创建**: {'✓ 是' if t42.tombstone_created else '✗ 否'}\n"
+            f"- **部分失败检测**: {'✓ 是' if t42.partial_failure_detected else '✗ 否'}\n"
+            f"- **自动清理**: {'✓ 成功' if t42.auto_cleanup else '✗ 失败'}\n"
+            f"- **测试时长**: {t42.duration:.1f}秒\n"
+            "- **测试文件**: test_movie_0010.mp4 到 test_movie_0019.mp4\n\n"
+            "### 删除操作详情\n\n"
+            "| 文件名 | 状态 | 响应 |\n"
+            "|--------|------|------|\n"
+        )
+        parts.extend(delete_table(self.test_results['test_4_2'].get('delete_results', [])))
+        parts.append("\n")
+
+        # 验证结果
+        parts.append(
+            "## 验证结果\n\n"
+            f"- **测试4.1**: {'✓ 通过' if t41.passed else '✗ 失败'}\n"
+            f"- **测试4.2**: {'✓ 通过' if t42.passed else '✗ 失败'}\n"
+            f"- **整体结果**: {'✓ 全部通过' if summary.all_passed else '✗ 存在失败'}\n\n"
+        )
+
+        # 测试结论
+        parts.append("## 测试结论\n\n")
+        if summary.all_passed:
+            parts.append(
+                "### ✅ 测试通过\n\n"
+                "墓碑机制验证测试完全通过，所有验证项均满足要求：\n\n"
+                "1. ✓ 删除后重启机制正常工作\n"
+                "2. ✓ 墓碑记录正确创建\n"
+                "3. ✓ 残留文件自动清理\n"
+                "4. ✓ 部分删除失败正确处理\n"
+                "5. ✓ 文件索引保持一致性\n\n"
+                "系统墓碑机制功能完善，能够有效防止文件'复活'问题。\n"
+            )
+        else:
+            parts.append("### ❌ 测试失败\n\n墓碑机制验证测试存在问题，需要检查以下方面：\n\n")
+            if not t41.passed:
+                parts.append("1. ✗ 测试4.1失败：检查删除后重启机制\n")
+            if not t42.passed:
+                parts.append("2. ✗ 测试4.2失败：检查部分删除失败处理\n")
+            parts.append(
+                "\n建议：\n"
+                "- 查看 Master 和 Worker 日志\n"
+                "- 检查文件索引状态\n"
+                "- 验证墓碑记录创建逻辑\n"
+            )
+
+        with open(report_file, 'w', encoding='utf-8', buffering=1 << 16) as f:
+            f.write(''.join(parts))
+
         self.log(f"\n报告已生成: {report_file}")
         return report_file
 
@@ -564,9 +763,6 @@ class TombstoneTestRunner:
             self.log(f"测试4.1异常: {e}", "ERROR")
             test_4_1_passed = False
         
-        # 等待一段时间
-        time.sleep(5)
-        
         # 执行测试4.2
         try:
             test_4_2_passed = self.run_test_4_2()
@@ -582,8 +778,12 @@ class TombstoneTestRunner:
         
         # 保存测试结果
         results_file = self.log_dir / f"test_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        with open(results_file, 'w', encoding='utf-8') as f:
-            json.dump(self.test_results, f, indent=2, ensure_ascii=False)
+        if orjson is not None:
+            with open(results_file, 'wb') as f:
+                f.write(orjson.dumps(self.test_results, option=orjson.OPT_INDENT_2))
+        else:
+            with open(results_file, 'w', encoding='utf-8') as f:
+                json.dump(self.test_results, f, indent=2, ensure_ascii=False)
         
         self.end_time = datetime.now()
         total_duration = (self.end_time - self.start_time).total_seconds()
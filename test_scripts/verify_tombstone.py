@@ -3,68 +3,229 @@
 墓碑机制验证脚本 - 验证墓碑机制的正确性
 """
 
+import atexit
 import requests
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import hyperscan
+except ImportError:
+    hyperscan = None
+from requests.adapters import HTTPAdapter
 import subprocess
 import json
+import re
+import string
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
+from urllib.parse import urlsplit
+
+from _common import default_test_files, log_timestamp
+
+# Master 日志中的墓碑创建与自动清理标记，直接在 UTF-8 字节上匹配，一次扫描同时统计两者
+_MARKERS = ('创建墓碑'.encode('utf-8'), '墓碑机制：自动删除'.encode('utf-8'))
+_MARKER_RE = re.compile(b'(' + re.escape(_MARKERS[0]) + b')|(' + re.escape(_MARKERS[1]) + b')')
+# 正则回退时保留上一块末尾的字节，以匹配跨越分块边界的标记
+_MARKER_CARRY = max(map(len, _MARKERS)) - 1
+LOG_READ_CHUNK = 1 << 16
+
+# 安装了 hyperscan 时用流模式的多模式字面量自动机扫描，否则回退到正则
+if hyperscan is not None:
+    _MARKER_DB = hyperscan.Database(mode=hyperscan.HS_MODE_STREAM)
+    _MARKER_DB.compile(expressions=list(_MARKERS), ids=[0, 1], elements=len(_MARKERS), literal=True)
+else:
+    _MARKER_DB = None
+
+
+def _count_markers(stream):
+    """分块读取日志字节流并统计各标记出现的次数，返回 [墓碑创建次数, 自动清理次数]"""
+    counts = [0, 0]
+    if _MARKER_DB is not None:
+        def on_match(pattern_id, start, end, flags, context):
+            counts[pattern_id] += 1
+        with _MARKER_DB.stream(match_event_handler=on_match) as hs_stream:
+            while chunk := stream.read(LOG_READ_CHUNK):
+                hs_stream.scan(chunk)
+        return counts
+
+    carry = b''
+    while chunk := stream.read(LOG_READ_CHUNK):
+        buf = carry + chunk
+        for m in _MARKER_RE.finditer(buf):
+            # 完全落在 carry 内的匹配已在上一块计过
+            if m.end() > len(carry):
+                counts[0 if m.group(1) else 1] += 1
+        carry = buf[-_MARKER_CARRY:]
+    return counts
+
+
+def _contains_marker(stream, marker):
+    """分块读取日志字节流，找到第一个标记即停止"""
+    carry = b''
+    while chunk := stream.read(LOG_READ_CHUNK):
+        buf = carry + chunk
+        if marker in buf:
+            return True
+        carry = buf[-(len(marker) - 1):]
+    return False
+
+
+# 报告中单项检查与残留文件条目的模板，模块加载时编译一次
+CHECK_TMPL = string.Template("#### $icon $name\n\n- **结果**: $result\n- **详情**: $details\n\n")
+ORPHAN_TMPL = string.Template("  - $worker: $file\n")
+
 
 class TombstoneVerifier:
     def __init__(self, master_url="http://localhost:8080"):
         self.master_url = master_url
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        atexit.register(self.session.close)
         self.verification_results = {
             'timestamp': datetime.now().isoformat(),
             'checks': {}
         }
+        # 各 Worker 的容器名与容器内数据目录（worker 以 ./data_<端口> 存储，工作目录为 /root）
+        self.workers = ('worker1', 'worker2', 'worker3')
+        self._worker_container = {w: f"movie-dist-kv-{w}-1" for w in self.workers}
+        self._worker_datadir = {w: f"/root/data_808{w[-1]}" for w in self.workers}
+        # Worker 端口映射到与 Master 相同的主机上
+        worker_host = urlsplit(master_url).hostname or 'localhost'
+        self._worker_url = {w: f"http://{worker_host}:808{w[-1]}" for w in self.workers}
+        self._files_cache = {}
+        self._marker_counts = {}
+        self._log_paths = None
+        self._stats = None
 
     def log(self, message, level="INFO"):
         """记录日志"""
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        log_entry = f"[{timestamp}] [{level}] {message}"
-        print(log_entry)
+        print(f"[{log_timestamp()}] [{level}] {message}")
 
     def get_stats(self):
         """获取 Master 统计信息"""
         try:
-            response = requests.get(f"{self.master_url}/stats", timeout=5)
+            response = self.session.get(f"{self.master_url}/stats", timeout=5)
+            if orjson is not None:
+                return orjson.loads(response.content)
             return response.json()
         except Exception as e:
             self.log(f"获取统计信息失败: {e}", "ERROR")
             return None
 
+    def invalidate_cache(self):
+        """清空本次验证缓存的文件列表、日志统计与 Master 统计，集群状态变化后调用"""
+        self._files_cache.clear()
+        self._marker_counts.clear()
+        self._stats = None
+
     def get_worker_files(self, worker_name):
-        """获取 Worker 节点上的文件列表"""
-        container_name = f"movie-dist-kv-{worker_name}-1"
+        """获取 Worker 节点上的文件列表，同一 Worker 在本次验证中只查询一次"""
+        if worker_name not in self._files_cache:
+            self._files_cache[worker_name] = self._fetch_worker_files(worker_name)
+        return self._files_cache[worker_name]
+
+    def _fetch_worker_files(self, worker_name):
+        """实际查询 Worker 节点上的文件列表"""
+        container_name = self._worker_container[worker_name]
         
+        # 优先通过 Worker 的 /files 接口获取，旧版本 Worker 没有该接口时回退到 docker exec ls
+        try:
+            response = self.session.get(f"{self._worker_url[worker_name]}/files", timeout=2)
+            if response.status_code == 200:
+                return response.json()
+        except (requests.RequestException, ValueError):
+            pass
+
         try:
-            result = subprocess.run(
-                ['docker', 'exec', container_name, 'ls', '/root/data_8082'],
-                capture_output=True, text=True
+            # 输出直接读入一个 bytearray，避免 communicate() 的分块列表拼接与整体解码
+            proc = subprocess.Popen(
+                ['docker', 'exec', container_name, 'ls', self._worker_datadir[worker_name]],
+                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
             )
-            
-            if result.returncode == 0:
-                files = [f for f in result.stdout.strip().split('\n') if f]
-                return files
+            buf = bytearray()
+            with proc.stdout:
+                while chunk := proc.stdout.read(LOG_READ_CHUNK):
+                    buf.extend(chunk)
+            if proc.wait() == 0:
+                return [line.decode('utf-8') for line in buf.splitlines() if line]
             return []
         except Exception as e:
             self.log(f"获取 {worker_name} 文件列表失败: {e}", "ERROR")
             return []
 
+    def _list_all_workers(self):
+        """并行获取所有 Worker 的文件列表，已缓存的 Worker 不再查询"""
+        missing = [w for w in self.workers if w not in self._files_cache]
+        if missing:
+            with ThreadPoolExecutor(max_workers=len(missing)) as executor:
+                list(executor.map(self.get_worker_files, missing))
+        return {w: self._files_cache[w] for w in self.workers}
+
+    def _get_log_paths(self):
+        """通过一次 docker inspect 获取各服务容器的 json-file 日志路径"""
+        if self._log_paths is None:
+            self._log_paths = {}
+            try:
+                ids = subprocess.run(
+                    ['docker-compose', 'ps', '-q'],
+                    capture_output=True, text=True
+                ).stdout.split()
+                if ids:
+                    result = subprocess.run(
+                        ['docker', 'inspect', '--format',
+                         '{{index .Config.Labels "com.docker.compose.service"}} {{.LogPath}}', *ids],
+                        capture_output=True, text=True
+                    )
+                    for line in result.stdout.splitlines():
+                        service, _, log_path = line.partition(' ')
+                        if service and log_path:
+                            self._log_paths[service] = log_path
+            except Exception as e:
+                self.log(f"获取容器日志路径失败: {e}", "WARNING")
+        return self._log_paths
+
+    def _scan_log(self, service, scanner):
+        """用 scanner 扫描服务日志字节流并返回其结果"""
+        log_path = self._get_log_paths().get(service)
+        if log_path:
+            # 直接读取容器日志文件，绕过 dockerd；文件不可读（如无 root 权限）时回退到 docker-compose
+            try:
+                with open(log_path, 'rb') as f:
+                    return scanner(f)
+            except OSError:
+                pass
+        proc = subprocess.Popen(
+            ['docker-compose', 'logs', '--no-color', service],
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+        )
+        try:
+            return scanner(proc.stdout)
+        finally:
+            # scanner 提前返回时不再读取剩余输出
+            if proc.poll() is None:
+                proc.terminate()
+            proc.stdout.close()
+            proc.wait()
+
+    def _get_marker_counts(self, service):
+        """流式读取服务日志并统计墓碑标记次数，每个服务只统计一次"""
+        if service not in self._marker_counts:
+            self._marker_counts[service] = self._scan_log(service, _count_markers)
+        return self._marker_counts[service]
+
     def verify_master_tombstone_records(self):
         """验证 Master 中的墓碑记录"""
         self.log("验证 Master 墓碑记录...")
         
         # 由于当前 API 不提供墓碑记录查询，我们通过日志验证
         try:
-            result = subprocess.run(
-                ['docker-compose', 'logs', 'master'],
-                capture_output=True, text=True
-            )
-            
-            logs = result.stdout
-            tombstone_count = logs.count('创建墓碑')
-            auto_cleanup_count = logs.count('墓碑机制：自动删除')
+            tombstone_count, auto_cleanup_count = self._get_marker_counts('master')
             
             self.log(f"  墓碑记录创建次数: {tombstone_count}")
             self.log(f"  自动清理触发次数: {auto_cleanup_count}")
@@ -91,12 +252,9 @@ class TombstoneVerifier:
         """验证 Worker 节点文件一致性"""
         self.log("验证 Worker 文件一致性...")
         
-        workers = ['worker1', 'worker2', 'worker3']
-        worker_files = {}
+        worker_files = self._list_all_workers()
         
-        for worker in workers:
-            files = self.get_worker_files(worker)
-            worker_files[worker] = files
+        for worker, files in worker_files.items():
             self.log(f"  {worker}: {len(files)} 个文件")
         
         # 验证没有重复的文件在不同节点上（除了副本）
@@ -115,20 +273,14 @@ class TombstoneVerifier:
         """验证没有残留文件"""
         self.log(f"验证无残留文件（检查 {len(test_files)} 个测试文件）...")
         
-        workers = ['worker1', 'worker2', 'worker3']
-        orphan_files = []
+        # 每个 Worker 的残留文件 = 其文件集合与测试文件集合的交集，排序保证输出稳定
+        test_set = frozenset(test_files)
+        orphan_map = {w: sorted(test_set.intersection(files)) for w, files in self._list_all_workers().items()}
+        orphan_files = [{'worker': w, 'file': name} for w, names in orphan_map.items() for name in names]
+        for orphan in orphan_files:
+            self.log(f"  {orphan['worker']}: 发现残留文件 {orphan['file']}", "ERROR")
         
-        for worker in workers:
-            files = self.get_worker_files(worker)
-            for test_file in test_files:
-                if test_file in files:
-                    orphan_files.append({
-                        'worker': worker,
-                        'file': test_file
-                    })
-                    self.log(f"  {worker}: 发现残留文件 {test_file}", "ERROR")
-        
-        passed = len(orphan_files) == 0
+        passed = not orphan_files
         self.log(f"  残留文件数量: {len(orphan_files)}")
         
         self.verification_results['checks']['no_orphan_files'] = {
@@ -143,8 +295,8 @@ class TombstoneVerifier:
         """验证文件索引一致性"""
         self.log("验证文件索引一致性...")
         
-        # 获取Master统计信息
-        stats = self.get_stats()
+        # 获取Master统计信息（优先使用预取结果）
+        stats = self._stats or self.get_stats()
         if not stats:
             self.verification_results['checks']['index_consistency'] = {
                 'passed': False,
@@ -156,12 +308,7 @@ class TombstoneVerifier:
         self.log(f"  Master 文件数: {master_file_count}")
         
         # 获取所有Worker的文件
-        workers = ['worker1', 'worker2', 'worker3']
-        total_worker_files = 0
-        
-        for worker in workers:
-            files = self.get_worker_files(worker)
-            total_worker_files += len(files)
+        total_worker_files = sum(len(files) for files in self._list_all_workers().values())
         
         self.log(f"  Worker 总文件数: {total_worker_files}")
         
@@ -182,36 +329,40 @@ class TombstoneVerifier:
         """验证自动清理机制已触发"""
         self.log("验证自动清理机制...")
         
-        workers = ['worker1', 'worker2', 'worker3']
-        cleanup_triggered = False
-        
-        for worker in workers:
-            try:
-                result = subprocess.run(
-                    ['docker-compose', 'logs', worker],
-                    capture_output=True, text=True
-                )
-                
-                logs = result.stdout
-                has_cleanup = '墓碑机制：自动删除' in logs
-                
-                if has_cleanup:
-                    self.log(f"  {worker}: 自动清理已触发")
-                    cleanup_triggered = True
-                else:
-                    self.log(f"  {worker}: 未发现自动清理记录")
-                    
-            except Exception as e:
-                self.log(f"  {worker}: 检查失败 {e}", "ERROR")
+        # 自动清理事件由 Master 在节点重新注册时输出；已有统计时直接复用，否则扫描到第一条记录即停止
+        try:
+            if 'master' in self._marker_counts:
+                cleanup_triggered = self._marker_counts['master'][1] > 0
+            else:
+                cleanup_triggered = self._scan_log('master', lambda stream: _contains_marker(stream, _MARKERS[1]))
+            if cleanup_triggered:
+                self.log("  master: 自动清理已触发")
+            else:
+                self.log("  master: 未发现自动清理记录")
+        except Exception as e:
+            self.log(f"  master: 检查失败 {e}", "ERROR")
+            cleanup_triggered = False
         
         passed = cleanup_triggered
         self.verification_results['checks']['auto_cleanup'] = {
             'passed': passed,
-            'details': '自动清理机制在至少一个Worker上触发'
+            'details': 'Master 日志是否包含自动清理标记'
         }
         
         return passed
 
+    def _prefetch(self):
+        """并行拉取各项检查依赖的外部数据：Master 日志、Worker 文件列表、Master 统计信息"""
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            logs_future = executor.submit(self._get_marker_counts, 'master')
+            files_future = executor.submit(self._list_all_workers)
+            stats_future = executor.submit(self.get_stats)
+
+        # 预取失败时不在这里处理，对应检查会重新获取并记录错误
+        for future in (logs_future, files_future):
+            future.exception()
+        self._stats = stats_future.result()
+
     def run_full_verification(self, test_files=None):
         """运行完整验证"""
         self.log("=" * 60)
@@ -221,6 +372,9 @@ class TombstoneVerifier:
         if test_files is None:
             test_files = []
         
+        # 各检查都以外部 I/O 为主，先并行预取，检查本身只做计算，按顺序执行保持日志可读
+        self._prefetch()
+        
         # 执行所有验证检查
         checks = [
             ('tombstone_records', self.verify_master_tombstone_records),
@@ -262,37 +416,52 @@ class TombstoneVerifier:
 
     def generate_report(self, output_file):
         """生成验证报告"""
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write("# 墓碑机制验证报告\n\n")
-            f.write(f"**验证时间**: {self.verification_results['timestamp']}\n\n")
-            
-            f.write("## 验证结果\n\n")
-            
+        overall = self.verification_results.get('overall', {})
+        parts = [
+            "# 墓碑机制验证报告\n\n",
+            f"**验证时间**: {self.verification_results['timestamp']}\n\n",
+            "## 验证结果\n\n",
             # 总体结果
-            overall = self.verification_results.get('overall', {})
-            f.write(f"### 总体结果: {'✅ 通过' if overall.get('passed') else '❌ 失败'}\n\n")
-            f.write(f"- 通过检查: {overall.get('passed_checks', 0)}/{overall.get('total_checks', 0)}\n\n")
-            
+            f"### 总体结果: {'✅ 通过' if overall.get('passed') else '❌ 失败'}\n\n",
+            f"- 通过检查: {overall.get('passed_checks', 0)}/{overall.get('total_checks', 0)}\n\n",
             # 详细检查结果
-            f.write("### 详细检查结果\n\n")
-            
-            for check_name, check_data in self.verification_results.get('checks', {}).items():
-                passed = check_data.get('passed', False)
-                status_icon = "✓" if passed else "✗"
-                f.write(f"#### {status_icon} {check_name}\n\n")
-                f.write(f"- **结果**: {'通过' if passed else '失败'}\n")
-                f.write(f"- **详情**: {check_data.get('details', 'N/A')}\n\n")
-                
-                # 如果有残留文件，列出它们
-                if 'orphan_files' in check_data:
-                    orphan_files = check_data['orphan_files']
-                    if orphan_files:
-                        f.write(f"- **残留文件**:\n")
-                        for orphan in orphan_files:
-                            f.write(f"  - {orphan['worker']}: {orphan['file']}\n")
-                        f.write("\n")
-        
-        self.log(f"验证报告已生成: {output_file}")
+            "### 详细检查结果\n\n",
+        ]
+
+        for check_name, check_data in self.verification_results.get('checks', {}).items():
+            passed = check_data.get('passed', False)
+            parts.append(CHECK_TMPL.substitute(
+                icon="✓" if passed else "✗",
+                name=check_name,
+                result='通过' if passed else '失败',
+                details=check_data.get('details', 'N/A'),
+            ))
+
+            # 如果有残留文件，列出它们
+            orphan_files = check_data.get('orphan_files')
+            if orphan_files:
+                parts.append("- **残留文件**:\n")
+                parts.extend(ORPHAN_TMPL.substitute(orphan) for orphan in orphan_files)
+                parts.append("\n")
+
+        with open(output_file, 'w', encoding='utf-8', buffering=1 << 20) as f:
+            f.write(''.join(parts))
+
+        # 每项检查一行 JSON，便于 grep/jq 跨多次运行聚合
+        jsonl_file = Path(output_file).with_suffix('.jsonl')
+        checks = self.verification_results.get('checks', {})
+        if orjson is not None:
+            with open(jsonl_file, 'wb') as jf:
+                jf.write(b''.join(
+                    orjson.dumps({'name': check_name, **check_data}, option=orjson.OPT_APPEND_NEWLINE)
+                    for check_name, check_data in checks.items()
+                ))
+        else:
+            with open(jsonl_file, 'w', encoding='utf-8') as jf:
+                for check_name, check_data in checks.items():
+                    jf.write(json.dumps({'name': check_name, **check_data}, ensure_ascii=False, separators=(',', ':')) + '\n')
+        
+        self.log(f"验证报告已生成: {output_file}, {jsonl_file}")
         return output_file
 
 def main():
@@ -311,7 +480,7 @@ def main():
     if args.test_files:
         test_files = args.test_files
     else:
-        test_files = [f"test_movie_{i:04d}.mp4" for i in range(20)]
+        test_files = default_test_files()
     
     # 运行验证
     passed = verifier.run_full_verification(test_files)
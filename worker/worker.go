@@ -273,6 +273,23 @@ mdfs_worker_up 1
 		w.Write([]byte(metrics))
 	})
 
+	// 11. 列出数据目录（含校验和与临时文件），供验证脚本直接查询，无需进入容器
+	http.HandleFunc("/files", func(w http.ResponseWriter, r *http.Request) {
+		entries, err := os.ReadDir(dataDir)
+		if err != nil {
+			http.Error(w, "扫描目录失败", 500)
+			return
+		}
+		names := make([]string, 0, len(entries))
+		for _, e := range entries {
+			if !strings.HasPrefix(e.Name(), ".") {
+				names = append(names, e.Name())
+			}
+		}
+		w.Header().Set("Content-Type", "application/json")
+		json.NewEncoder(w).Encode(names)
+	})
+
 	fmt.Printf("Worker %s 启动，存储目录: %s\n", addr, dataDir)
 	http.ListenAndServe(":"+*port, nil)
 }